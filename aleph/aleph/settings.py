@@ -95,10 +95,16 @@ DATABASES = {
     }
 }
 
+# Uploads are hashed and sniffed while they are received, see users/uploadhandlers.py
+FILE_UPLOAD_HANDLERS = [
+    'users.uploadhandlers.DigestMemoryFileUploadHandler',
+    'users.uploadhandlers.DigestTemporaryFileUploadHandler',
+]
+
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        "knox.auth.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -109,7 +115,11 @@ REST_FRAMEWORK = {
 FILTERS_DEFAULT_LOOKUP_EXPR = 'icontains'
 REST_KNOX = {
     'AUTO_REFRESH': True,
+    # Seconds between expiry refresh writes of a token
+    'MIN_REFRESH_INTERVAL': 60,
 }
+# Seconds a validated token is served from the cache, see users/authentication.py
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60))
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -134,6 +144,21 @@ ELASTICSEARCH_DSL = {
         'hosts': 'http://ec2-23-23-53-109.compute-1.amazonaws.com:9200'
     },
 }
+# Saves only queue the object for indexing, flush_search_index sends the
+# queue to Elasticsearch in bulk batches (users/signals.py)
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'users.signals.QueuedSignalProcessor'
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv('SEARCH_INDEX_BATCH_SIZE', 500))
+SEARCH_INDEX_FLUSH_INTERVAL = int(os.getenv('SEARCH_INDEX_FLUSH_INTERVAL', 5))  # seconds
+
+# Backend behind OCRTextSearchAPIView: 'elasticsearch' or 'postgres'
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'elasticsearch')
+# Text search configuration of OCRText.search_vector; 'simple' does not stem,
+# like the Elasticsearch standard analyzer
+POSTGRES_SEARCH_CONFIG = os.getenv('POSTGRES_SEARCH_CONFIG', 'simple')
+# Keep OCRText.search_vector up to date on save. On by default only when the
+# Postgres backend is the default one; after turning it on, backfill with
+# the update_search_vectors command.
+POSTGRES_SEARCH_VECTORS = os.getenv('POSTGRES_SEARCH_VECTORS', '1' if SEARCH_BACKEND == 'postgres' else '0') == '1'
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
@@ -175,3 +200,41 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_RESULT_BACKEND = 'django-db'
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for queued search index updates whose flush was missed
+    'flush-search-index': {
+        'task': 'users.tasks.flush_search_index',
+        'schedule': 60.0,
+    },
+}
+
+# Redis shares cached responses and their invalidation between processes;
+# the local memory fallback is only consistent within a single process
+CACHE_IS_SHARED = bool(os.getenv('CACHE_REDIS_URL'))
+if CACHE_IS_SHARED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Upper bound on how long a cached API response is kept, see users/response_cache.py
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+# Ingest invalidates from Celery workers, so responses are only cached in a shared cache
+RESPONSE_CACHE_ENABLED = CACHE_IS_SHARED
+
+# Format of new User.user_id values: prefix plus a sequence number written in
+# the alphabet, padded to the minimum length. Numbers are reserved in blocks.
+USER_ID_PREFIX = os.getenv('USER_ID_PREFIX', 'U')
+USER_ID_ALPHABET = os.getenv('USER_ID_ALPHABET', '0123456789ABCDEFGHJKLMNPQRSTUVWXYZ')
+USER_ID_MIN_LENGTH = int(os.getenv('USER_ID_MIN_LENGTH', 6))
+USER_ID_BLOCK_SIZE = int(os.getenv('USER_ID_BLOCK_SIZE', 50))
+
+# Maximum number of extraction results kept in the content-addressed OCR cache
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', 10000))
@@ -3,6 +3,11 @@ import os
 from fs import open_fs
 import mimetypes
 import datetime
+import fitz
+import magic
+
+# Number of leading bytes kept from an upload to sniff its MIME type
+SNIFF_BYTES = 8192
 
 def calculate_checksum(file_path, file_name):
     # Initialize a SHA-256 hash object
@@ -19,6 +24,65 @@ def calculate_checksum(file_path, file_name):
     # Return the hexadecimal representation of the hash
     return sha256_hash.hexdigest()
 
+def calculate_content_digest(file_path):
+    # SHA-256 of the file bytes only, so identical uploads share a digest
+    # regardless of their file name
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+def write_file_chunks(chunks, file_path):
+    # Write the chunks to disk and hash them in the same pass, so the file
+    # never has to be read back. Returns the hash object, size and head bytes.
+    sha256_hash = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(file_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            sha256_hash.update(chunk)
+            size += len(chunk)
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+    return sha256_hash, size, head
+
+def count_pdf_pages(file_path):
+    # Only the xref table and page tree are read, not the whole file
+    try:
+        with fitz.open(file_path) as pdf_document:
+            return pdf_document.page_count
+    except Exception:
+        return None
+
+def build_upload_info(file_path, file_name, sha256_hash, size, head):
+    # Describe an upload from the digest, size and head bytes gathered while it
+    # was written. 'checksum' matches calculate_checksum(file_path, file_name).
+    named_hash = sha256_hash.copy()
+    named_hash.update(file_name.encode('utf-8'))
+
+    file_type = magic.from_buffer(head, mime=True) if head else None
+    if not file_type or file_type == 'application/octet-stream':
+        file_type = mimetypes.guess_type(file_name)[0] or file_type or 'unknown'
+
+    now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'checksum': named_hash.hexdigest(),
+        'content_digest': sha256_hash.hexdigest(),
+        'metadata': {
+            'Name': file_name,
+            'Size (bytes)': size,
+            'Type': file_type,
+            'Is Directory': False,
+            'Creation Time': now,
+            'Last Modified Time': now,
+            'Last Accessed Time': now,
+            'Permissions': None,
+            'Page Count': count_pdf_pages(file_path) if 'pdf' in file_type else None
+        }
+    }
+
 def get_file_metadata(file_path):
     # Open the filesystem
     fs = open_fs(os.path.dirname(file_path))
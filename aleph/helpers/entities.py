@@ -0,0 +1,86 @@
+import re
+
+# Entity type -> (regex, normalizer). Patterns must not define capturing
+# groups of their own; they are combined into one scanner as named groups.
+# Earlier entries win when two patterns match at the same position.
+EXTRACTORS = {}
+
+MONTHS = r'(?i:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?'
+
+_scanner = None
+
+
+def register_extractor(name, pattern, normalize=None):
+    """
+    Register an entity type. normalize(value) returns the value to store, or
+    None to discard the match.
+    """
+    global _scanner
+    EXTRACTORS[name] = (pattern, normalize or (lambda value: value))
+    _scanner = None
+
+def get_scanner():
+    """
+    The single regex matching every registered entity type, compiled once.
+    """
+    global _scanner
+    if _scanner is None:
+        _scanner = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, (pattern, _) in EXTRACTORS.items()))
+    return _scanner
+
+def extract_entities(pages):
+    """
+    Scan text once for every registered entity type.
+
+    Args:
+        pages (iterable): Text chunks (e.g. one per page), consumed lazily.
+
+    Returns:
+        dict: Entity type -> deduplicated values in order of first appearance.
+    """
+    scanner = get_scanner()
+    found = {name: {} for name in EXTRACTORS}
+    for text in pages:
+        for match in scanner.finditer(text or ''):
+            name = match.lastgroup
+            value = EXTRACTORS[name][1](match.group(name))
+            if value is not None:
+                found[name].setdefault(value, None)
+    return {name: list(values) for name, values in found.items()}
+
+
+def _normalize_email(value):
+    # Same form as DocumentEmail.normalize
+    return value.lower()
+
+def _normalize_iban(value):
+    return value.replace(' ', '')
+
+def _normalize_phone(value):
+    digits = re.sub(r'\D', '', value)
+    if not 8 <= len(digits) <= 15:
+        return None
+    return ('+' if value.startswith('+') else '') + digits
+
+def _normalize_url(value):
+    return value.rstrip('.,;:!?)]')
+
+
+register_extractor('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', _normalize_email)
+register_extractor('url', r'\b(?:https?://|www\.)[^\s<>"\']+', _normalize_url)
+register_extractor('iban', r'\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,4})?\b', _normalize_iban)
+register_extractor(
+    'date',
+    r'\b(?:\d{4}[/.-]\d{1,2}[/.-]\d{1,2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}'
+    rf'|\d{{1,2}} {MONTHS},? \d{{4}}|{MONTHS} \d{{1,2}},? \d{{4}})\b'
+)
+# A phone number starts with + or a trunk 0, or is a North American
+# number: a 3-digit area code not starting with 0 or 1, then 3 and 4 digits.
+# Plain digit runs and other digit groups (invoice and order numbers),
+# dot-grouped amounts and numbers inside hyphenated references are not matched.
+register_extractor(
+    'phone',
+    r'(?<![\w+./-])(?:\+\d[\d ().-]{6,}\d|\(?0\d[\d ()-]{5,}\d'
+    r'|(?:\([2-9]\d{2}\) ?|[2-9]\d{2}[ -])\d{3}[ -]\d{4})\b(?![-/.]\d)',
+    _normalize_phone
+)
@@ -2,12 +2,93 @@ import fitz
 from PIL import Image
 import pytesseract
 import io
+import os
+import hashlib
 import re
 import magic
 from docx import Document
 import subprocess
 import csv
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from helpers.entities import EXTRACTORS, extract_entities
+
+# Bump whenever a change to the extraction code alters its output, so that
+# cached extraction results produced by older code are not reused.
+OCR_PIPELINE_VERSION = '5'
+
+# Maximum number of Celery tasks the text extraction of a single PDF is split
+# into (see users/tasks.py). The tasks are spread over all workers.
+OCR_MAX_WORKERS = int(os.getenv('OCR_MAX_WORKERS', 8))
+
+# PDFs with fewer pages than this are always extracted by one task, the
+# overhead of the extra tasks is not worth it for small documents.
+OCR_PARALLEL_MIN_PAGES = int(os.getenv('OCR_PARALLEL_MIN_PAGES', 8))
+
+# When to OCR the images embedded in a PDF page:
+#   always - OCR every image (previous behaviour)
+#   auto   - only OCR pages whose text layer looks missing or too thin
+#   never  - rely on the text layer only
+OCR_POLICY_ALWAYS = 'always'
+OCR_POLICY_AUTO = 'auto'
+OCR_POLICY_NEVER = 'never'
+OCR_POLICY = os.getenv('OCR_POLICY', OCR_POLICY_AUTO)
+
+# Thresholds used by the 'auto' policy.
+OCR_MIN_TEXT_CHARS = int(os.getenv('OCR_MIN_TEXT_CHARS', 50))
+OCR_MIN_TEXT_DENSITY = float(os.getenv('OCR_MIN_TEXT_DENSITY', 1.0))  # characters per 1000 pt^2
+OCR_IMAGE_COVERAGE_THRESHOLD = float(os.getenv('OCR_IMAGE_COVERAGE_THRESHOLD', 0.5))
+
+# Number of embedded-image OCR results remembered per worker process.
+OCR_IMAGE_CACHE_SIZE = int(os.getenv('OCR_IMAGE_CACHE_SIZE', 1024))
+
+
+class ImageOCRCache:
+    """
+    LRU memo of OCR output keyed by the SHA-256 of an image's bytes.
+
+    Letterheads, signatures and logos recur across pages and documents; with
+    this memo each distinct image is only OCRed once per process. Extraction
+    runs in the long-lived Celery worker processes, so the memo carries over
+    between the documents and page ranges a process handles, but it is not
+    shared with the other worker processes.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+        return text
+
+    def set(self, key, text):
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
 
+image_ocr_cache = ImageOCRCache(OCR_IMAGE_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def _tesseract_version():
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return 'unknown'
+
+def get_engine_version():
+    """
+    Identify the extraction pipeline, tesseract build and OCR policy that
+    produce a result, used to key cached extraction results.
+    """
+    return f"{OCR_PIPELINE_VERSION}/tesseract-{_tesseract_version()}/{OCR_POLICY}"
 
 def extract_text_from_image(image_path):
     """
@@ -20,25 +101,171 @@ def extract_text_from_image(image_path):
     except Exception as e:
         raise RuntimeError(f"Failed to extract text from image: {str(e)}")
 
-def extract_text_from_pdf(pdf_path):
+def classify_pdf_page(page, page_text, images, ocr_policy=None):
     """
-    Extract text from each page of a PDF document.
+    Decide whether the embedded images of a PDF page need to be OCRed.
+
+    Under the 'auto' policy a page is OCRed when it has images and either no
+    fonts, almost no text, or a sparse text layer on a page mostly covered by
+    images (a scan). Returns a dict describing the decision.
+    """
+    ocr_policy = ocr_policy or OCR_POLICY
+    page_area = abs(page.rect) or 1
+    text_chars = len(page_text.strip())
+    text_density = text_chars / page_area * 1000
+    image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+    image_coverage = min(1.0, image_area / page_area)
+    has_fonts = bool(page.get_fonts())
+
+    if ocr_policy == OCR_POLICY_ALWAYS:
+        needs_ocr, reason = bool(images), 'policy'
+    elif ocr_policy == OCR_POLICY_NEVER:
+        needs_ocr, reason = False, 'policy'
+    elif not images:
+        needs_ocr, reason = False, 'no_images'
+    elif not has_fonts:
+        needs_ocr, reason = True, 'no_fonts'
+    elif text_chars < OCR_MIN_TEXT_CHARS:
+        needs_ocr, reason = True, 'no_text_layer'
+    elif image_coverage >= OCR_IMAGE_COVERAGE_THRESHOLD and text_density < OCR_MIN_TEXT_DENSITY:
+        needs_ocr, reason = True, 'sparse_text_layer'
+    else:
+        needs_ocr, reason = False, 'text_layer'
+
+    return {
+        'ocr': needs_ocr,
+        'reason': reason,
+        'text_chars': text_chars,
+        'text_density': round(text_density, 3),
+        'image_coverage': round(image_coverage, 3),
+        'has_fonts': has_fonts,
+        'images': len(images),
+        'images_memoized': 0,
+        'ocr_seconds': 0.0,
+    }
+
+def _ocr_pdf_image(pdf_document, xref, xref_memo):
+    """
+    OCR an embedded PDF image, reusing earlier results.
+
+    xref_memo maps image xrefs already seen in this document to their text, so
+    repeated references skip both extraction and OCR. Across documents images
+    are matched on their content hash through image_ocr_cache. Returns the
+    text and whether it came from a memo.
+    """
+    if xref in xref_memo:
+        return xref_memo[xref], True
+    base_image = pdf_document.extract_image(xref)
+    image_bytes = base_image["image"]
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
+    text = image_ocr_cache.get(image_digest)
+    memoized = text is not None
+    if not memoized:
+        image = Image.open(io.BytesIO(image_bytes))
+        text = pytesseract.image_to_string(image)
+        image_ocr_cache.set(image_digest, text)
+    xref_memo[xref] = text
+    return text, memoized
+
+def extract_pdf_page_range(pdf_path, start_page, end_page, ocr_policy=None):
+    """
+    Extract text from pages [start_page, end_page) of a PDF document.
+
+    Returns one dict per page with the page's text fragments (the text layer
+    followed by the OCR output of each embedded image) and the OCR decision
+    taken for it.
     """
+    pages = []
+    xref_memo = {}
+    pdf_document = fitz.open(pdf_path)
     try:
-        text = []
-        pdf_document = fitz.open(pdf_path)
-        for page_num in range(len(pdf_document)):
+        for page_num in range(start_page, end_page):
             page = pdf_document.load_page(page_num)
-            text.append(page.get_text())
+            page_text = [page.get_text()]
             images = page.get_images(full=True)
-            for img_index, img in enumerate(images):
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image = Image.open(io.BytesIO(image_bytes))
-                text.append(pytesseract.image_to_string(image))
+            decision = classify_pdf_page(page, page_text[0], images, ocr_policy)
+            decision['page'] = page_num + 1
+            if decision['ocr']:
+                started = time.monotonic()
+                for img_index, img in enumerate(images):
+                    text, memoized = _ocr_pdf_image(pdf_document, img[0], xref_memo)
+                    page_text.append(text)
+                    decision['images_memoized'] += memoized
+                decision['ocr_seconds'] = round(time.monotonic() - started, 3)
+            pages.append({'fragments': page_text, 'ocr': decision})
+    finally:
         pdf_document.close()
-        return "\n".join(text)
+    return pages
+
+def split_page_ranges(page_count, workers=None):
+    """
+    Split a document into at most workers (OCR_MAX_WORKERS by default)
+    contiguous page ranges of similar size, or a single range when it has
+    fewer than OCR_PARALLEL_MIN_PAGES pages.
+    """
+    workers = OCR_MAX_WORKERS if workers is None else workers
+    if workers <= 1 or page_count < OCR_PARALLEL_MIN_PAGES:
+        return [(0, page_count)]
+    range_size = -(-page_count // workers)
+    return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+def extract_pdf_pages(pdf_path, ocr_policy=None):
+    """
+    Extract text and OCR decisions for every page of a PDF document.
+    """
+    pdf_document = fitz.open(pdf_path)
+    page_count = len(pdf_document)
+    pdf_document.close()
+    return extract_pdf_page_range(pdf_path, 0, page_count, ocr_policy)
+
+def summarize_ocr_decisions(pages, ocr_policy=None):
+    """
+    Summarize the per-page OCR decisions of a PDF extraction.
+
+    The time saved is estimated from the average tesseract cost per image on
+    the pages that were OCRed, counting both skipped and memoized images.
+    """
+    decisions = [page['ocr'] for page in pages]
+    ocred = [d for d in decisions if d['ocr']]
+    images_ocred = sum(d['images'] for d in ocred)
+    images_skipped = sum(d['images'] for d in decisions if not d['ocr'])
+    images_memoized = sum(d['images_memoized'] for d in ocred)
+    images_tesseracted = images_ocred - images_memoized
+    ocr_seconds = sum(d['ocr_seconds'] for d in ocred)
+    seconds_per_image = ocr_seconds / images_tesseracted if images_tesseracted else 0.0
+    return {
+        'policy': ocr_policy or OCR_POLICY,
+        'pages': len(decisions),
+        'pages_ocred': len(ocred),
+        'pages_skipped': len(decisions) - len(ocred),
+        'images_ocred': images_ocred,
+        'images_skipped': images_skipped,
+        'images_memoized': images_memoized,
+        'ocr_seconds': round(ocr_seconds, 3),
+        'estimated_seconds_saved': round((images_skipped + images_memoized) * seconds_per_image, 3),
+        'decisions': decisions,
+    }
+
+def build_pdf_result(pages):
+    """
+    Join the pages of a PDF extraction, in document order, into the text,
+    per-page text and OCR summary of an extraction result.
+    """
+    page_texts = ["\n".join(page['fragments']) for page in pages]
+    return {
+        'text': "\n".join(page_texts),
+        'pages': page_texts,
+        'ocr_stats': summarize_ocr_decisions(pages),
+        'page_count': len(pages),
+    }
+
+def extract_text_from_pdf(pdf_path, ocr_policy=None):
+    """
+    Extract text from each page of a PDF document.
+    """
+    try:
+        pages = extract_pdf_pages(pdf_path, ocr_policy)
+        return "\n".join(fragment for page in pages for fragment in page['fragments'])
     except Exception as e:
         raise RuntimeError(f"Failed to extract text from PDF: {str(e)}")
 
@@ -87,13 +314,15 @@ def extract_text_from_csv(file_path):
     except Exception as e:
         raise RuntimeError(f"Error reading CSV file: {str(e)}")
 
+EMAIL_PATTERN = re.compile(EXTRACTORS['email'][0])
+
 def extract_emails(text):
     """
     Extract emails from text using regex.
     """
     try:
-        email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-        return email_pattern.findall(text)
+        normalize = EXTRACTORS['email'][1]
+        return [normalize(email) for email in EMAIL_PATTERN.findall(text)]
     except Exception as e:
         raise RuntimeError(f"Failed to extract emails from text: {str(e)}")
 
@@ -103,7 +332,10 @@ def extract_text_from_file(file_path):
     """
     result = {
         'text': None,
-        'error': None
+        'error': None,
+        'ocr_stats': None,
+        'page_count': None,
+        'pages': None
     }
 
     try:
@@ -111,7 +343,11 @@ def extract_text_from_file(file_path):
         file_type = mime.from_file(file_path)
 
         if 'pdf' in file_type:
-            result['text'] = extract_text_from_pdf(file_path)
+            try:
+                pages = extract_pdf_pages(file_path)
+            except Exception as e:
+                raise RuntimeError(f"Failed to extract text from PDF: {str(e)}")
+            result.update(build_pdf_result(pages))
         elif 'officedocument.wordprocessingml.document' in file_type:
             result['text'] = extract_text_from_docx(file_path)
         elif 'msword' in file_type or file_path.endswith('.doc'):
@@ -128,18 +364,21 @@ def extract_text_from_file(file_path):
         result['error'] = f"Error extracting text from file: {str(e)}"
         result['text'] = ""  # Ensure 'text' is a string even if there is an error
 
+    # Formats without pages are stored as a single page of text
+    if result['pages'] is None:
+        result['pages'] = [result['text']] if result['text'] else []
+
     return result
 
 def ocr_document(file_path):
     """
-    Perform OCR on the given document file.
+    Perform OCR on the given document file. Entities are extracted in a
+    single pass over the pages and stored on result['entities'].
     """
     try:
-        emails = []
         result = extract_text_from_file(file_path)
-        if result.get('text'):
-            emails = extract_emails(result['text'])
-        return result, emails
+        result['entities'] = extract_entities(result['pages'])
+        return result, result['entities']['email']
     except Exception as e:
         raise RuntimeError(f"OCR failed for document: {str(e)}")
 
@@ -0,0 +1,75 @@
+import io
+import os
+import fitz
+from PIL import Image
+
+# Encoding of the page images shown in the document viewer
+PAGE_IMAGE_FORMAT = os.getenv('PAGE_IMAGE_FORMAT', 'jpeg')
+PAGE_IMAGE_QUALITY = int(os.getenv('PAGE_IMAGE_QUALITY', 80))
+PAGE_IMAGE_DPI = int(os.getenv('PAGE_IMAGE_DPI', 110))
+PAGE_IMAGE_MAX_WIDTH = int(os.getenv('PAGE_IMAGE_MAX_WIDTH', 1600))
+PAGE_IMAGE_MAX_HEIGHT = int(os.getenv('PAGE_IMAGE_MAX_HEIGHT', 2200))
+
+# Format name -> (S3 key extension, Content-Type)
+IMAGE_FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg'),
+    'webp': ('webp', 'image/webp'),
+    'png': ('png', 'image/png'),
+}
+
+
+def page_zoom(page, dpi, max_width=None, max_height=None):
+    """
+    Zoom factor rendering the page at the given DPI, reduced so that the
+    image fits within max_width x max_height pixels.
+    """
+    zoom = dpi / 72
+    if max_width:
+        zoom = min(zoom, max_width / page.rect.width)
+    if max_height:
+        zoom = min(zoom, max_height / page.rect.height)
+    return zoom
+
+def render_page_image(page, image_format=None, quality=None, dpi=None, max_width=None, max_height=None):
+    """
+    Render a PDF page to an encoded image.
+
+    Args:
+        page (fitz.Page): The page to render.
+        image_format (str, optional): 'jpeg', 'webp' or 'png'. Defaults to PAGE_IMAGE_FORMAT.
+        quality (int, optional): JPEG/WebP quality (1-100). Defaults to PAGE_IMAGE_QUALITY.
+        dpi (int, optional): Target resolution. Defaults to PAGE_IMAGE_DPI.
+        max_width (int, optional): Maximum width in pixels. Defaults to PAGE_IMAGE_MAX_WIDTH.
+        max_height (int, optional): Maximum height in pixels. Defaults to PAGE_IMAGE_MAX_HEIGHT.
+
+    Returns:
+        tuple: The image bytes, the file extension and the Content-Type.
+    """
+    image_format = (image_format or PAGE_IMAGE_FORMAT).lower()
+    if image_format == 'jpg':
+        image_format = 'jpeg'
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported page image format: {image_format}")
+    quality = quality or PAGE_IMAGE_QUALITY
+    zoom = page_zoom(
+        page,
+        dpi or PAGE_IMAGE_DPI,
+        PAGE_IMAGE_MAX_WIDTH if max_width is None else max_width,
+        PAGE_IMAGE_MAX_HEIGHT if max_height is None else max_height
+    )
+
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if image_format == 'png':
+        image_bytes = pixmap.tobytes('png')
+    else:
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        buffer = io.BytesIO()
+        if image_format == 'jpeg':
+            image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, format='WEBP', quality=quality, method=4)
+        image_bytes = buffer.getvalue()
+    pixmap = None  # Clean up the pixmap object
+
+    extension, content_type = IMAGE_FORMATS[image_format]
+    return image_bytes, extension, content_type
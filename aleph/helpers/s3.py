@@ -1,19 +1,42 @@
+import os
+import threading
 import boto3
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+# Size of the HTTP connection pool of the shared client
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+
+# Threads used by upload_batch_to_s3
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', 16))
+
+# Multipart settings used when uploading large originals
+S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv('S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024))
+S3_MULTIPART_CONCURRENCY = int(os.getenv('S3_MULTIPART_CONCURRENCY', 10))
 
 class S3Service:
-    def __init__(self, s3="s3", region_name=None, aws_access_key_id=None, aws_secret_access_key=None) -> None:
-        self.s3 = boto3.resource(
-            service_name=s3,
-            region_name=region_name,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key
+    def __init__(self, s3="s3", region_name=None, aws_access_key_id=None, aws_secret_access_key=None,
+                 endpoint_url=None, max_pool_connections=None) -> None:
+        # endpoint_url points the service at a local S3 stand-in (MinIO, moto server) for testing.
+        # Only a client is created: unlike resources, clients are thread-safe and can be shared.
+        config = Config(
+            max_pool_connections=max_pool_connections or max(10, S3_UPLOAD_WORKERS, S3_MULTIPART_CONCURRENCY)
         )
         self.client = boto3.client(
             service_name=s3,
             region_name=region_name,
             aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key
+            aws_secret_access_key=aws_secret_access_key,
+            endpoint_url=endpoint_url,
+            config=config
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_MULTIPART_CONCURRENCY
         )
 
     def upload_to_s3(self, file_name, bucket_name, key=None):
@@ -35,16 +58,18 @@ class S3Service:
                 content_type = 'application/octet-stream'  # Fallback MIME type
 
             # Upload the file with the specified content type
-            self.s3.Bucket(bucket_name).upload_file(
+            self.client.upload_file(
                 Filename=file_name,
+                Bucket=bucket_name,
                 Key=key,
-                ExtraArgs={'ContentType': content_type}
+                ExtraArgs={'ContentType': content_type},
+                Config=self.transfer_config
             )
             return True
         except Exception as e:
             raise Exception(f"Failed to upload {file_name} to {bucket_name}: {e}")
     
-    def upload_image_to_s3(self, image_bytes, bucket_name, key=None):
+    def upload_image_to_s3(self, image_bytes, bucket_name, key=None, content_type=None):
         """
         Uploads image bytes to the specified S3 bucket.
 
@@ -52,20 +77,55 @@ class S3Service:
             image_bytes (bytes): The bytes of the image to upload.
             bucket_name (str): The name of the S3 bucket.
             key (str, optional): The key (path) under which to store the image in the bucket. Defaults to None.
+            content_type (str, optional): The Content-Type stored with the image. Defaults to None.
 
         Returns:
             bool: True if upload is successful, False otherwise.
         """
         try:
             # Upload the image bytes
-            self.s3.Bucket(bucket_name).put_object(
+            extra_args = {'ContentType': content_type} if content_type else {}
+            self.client.put_object(
+                Bucket=bucket_name,
                 Key=key,
-                Body=image_bytes
+                Body=image_bytes,
+                **extra_args
             )
             return True
         except Exception as e:
             raise Exception(f"Failed to upload image to {bucket_name}: {e}")
 
+    def upload_batch_to_s3(self, items, bucket_name, max_workers=None):
+        """
+        Uploads many objects concurrently from a bounded thread pool sharing this service's client.
+
+        Args:
+            items (list): (key, body, content_type) tuples; content_type may be None.
+            bucket_name (str): The name of the S3 bucket.
+            max_workers (int, optional): Upload threads. Defaults to S3_UPLOAD_WORKERS.
+
+        Returns:
+            dict: Maps each key to {'success': bool, 'error': str or None}.
+        """
+        def upload(key, body, content_type):
+            extra_args = {'ContentType': content_type} if content_type else {}
+            self.client.put_object(Bucket=bucket_name, Key=key, Body=body, **extra_args)
+
+        results = {}
+        if not items:
+            return results
+        workers = min(max_workers or S3_UPLOAD_WORKERS, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(upload, *item): item[0] for item in items}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    future.result()
+                    results[key] = {'success': True, 'error': None}
+                except Exception as e:
+                    results[key] = {'success': False, 'error': f"Failed to upload {key} to {bucket_name}: {e}"}
+        return results
+
     def download_from_s3(self, s3_file, s3_bucket, local_file):
         """
         Downloads a file from the specified S3 bucket to the local filesystem.
@@ -79,7 +139,7 @@ class S3Service:
             bool: True if download is successful, False otherwise.
         """
         try:
-            self.s3.Bucket(s3_bucket).download_file(s3_file, local_file)
+            self.client.download_file(s3_bucket, s3_file, local_file)
             return True
         except Exception as e:
             raise Exception(f"Failed to download {s3_file} from {s3_bucket}: {e}")
@@ -96,8 +156,7 @@ class S3Service:
             str: The pre-signed URL for accessing the file.
         """
         try:
-            bucket = self.s3.Bucket(s3_bucket)
-            object_url = f"https://{bucket.name}.s3.amazonaws.com/{s3_file}"
+            object_url = f"https://{s3_bucket}.s3.amazonaws.com/{s3_file}"
             return object_url
         except Exception as e:
             raise Exception(f"Failed to get URL for {s3_file} in {s3_bucket}: {e}")
@@ -137,3 +196,37 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Failed to delete files from {s3_bucket}: {e}")
 
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+def get_s3_service():
+    """
+    Returns the S3Service shared by this process, created on first use from the
+    environment. Views and Celery tasks reuse its client and connection pool
+    instead of paying session setup and credential resolution on every call.
+
+    Returns:
+        S3Service: The process-wide service.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = S3Service(
+                    region_name=os.getenv('REGION'),
+                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                    endpoint_url=os.getenv('S3_ENDPOINT_URL'),
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS
+                )
+    return _shared_service
+
+def _reset_shared_service():
+    # Connections must not be shared with a forked child (Celery prefork,
+    # gunicorn workers), so each child builds its own service on first use
+    global _shared_service, _shared_service_lock
+    _shared_service = None
+    _shared_service_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_shared_service)
@@ -22,9 +22,30 @@ class PageImageAdmin(admin.ModelAdmin):
 class OCRTextAdmin(admin.ModelAdmin):
     list_display = ['id', 'document']
 
+class OCRPageTextAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'page_number']
+
+class SearchIndexQueueAdmin(admin.ModelAdmin):
+    list_display = ['id', 'app_label', 'model_name', 'object_id', 'action', 'created_at']
+
+class DocumentEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'email', 'document']
+    search_fields = ['email']
+
+class OCRResultCacheAdmin(admin.ModelAdmin):
+    list_display = ['id', 'content_digest', 'engine_version', 'page_count', 'last_used_at']
+
+class OCRPageResultAdmin(admin.ModelAdmin):
+    list_display = ['id', 'content_digest', 'engine_version', 'page_number', 'created_at']
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Document, DocumentAdmin)
 admin.site.register(DocumentMeta, DocumentMetaAdmin)
 admin.site.register(Project, ProjectAdmin)
 admin.site.register(PageImage, PageImageAdmin)
 admin.site.register(OCRText, OCRTextAdmin)
+admin.site.register(OCRPageText, OCRPageTextAdmin)
+admin.site.register(OCRResultCache, OCRResultCacheAdmin)
+admin.site.register(OCRPageResult, OCRPageResultAdmin)
+admin.site.register(DocumentEmail, DocumentEmailAdmin)
+admin.site.register(SearchIndexQueue, SearchIndexQueueAdmin)
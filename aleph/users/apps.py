@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from users import signals  # noqa: F401
+        from users.user_ids import create_sequence
+        post_migrate.connect(create_sequence, sender=self)
@@ -0,0 +1,70 @@
+import binascii
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from knox.auth import TokenAuthentication
+from knox.crypto import hash_token
+from knox.models import AuthToken
+from knox.settings import knox_settings
+from rest_framework import exceptions
+
+
+def token_cache_key(digest):
+    return f'auth-token:{digest}'
+
+def invalidate_token(digest):
+    cache.delete(token_cache_key(digest))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    knox TokenAuthentication that keeps validated tokens, with their user, in
+    the cache for AUTH_TOKEN_CACHE_TIMEOUT seconds, so a request with a known
+    token does no database work. Entries are keyed by the token digest and
+    dropped when the token is deleted (logout) or its user is saved or deleted,
+    see users/signals.py.
+
+    With AUTO_REFRESH the expiry is extended at most once per
+    MIN_REFRESH_INTERVAL per token across all processes, with a single UPDATE.
+
+    Invalidation has to reach every web process, so without a shared cache
+    (CACHE_IS_SHARED) this behaves exactly like knox TokenAuthentication.
+    """
+
+    def authenticate_credentials(self, token):
+        if not settings.CACHE_IS_SHARED:
+            return super().authenticate_credentials(token)
+
+        try:
+            digest = hash_token(token.decode('utf-8'))
+        except (TypeError, binascii.Error, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        key = token_cache_key(digest)
+        cached = cache.get(key)
+        if cached is not None:
+            user, auth_token = cached
+            if auth_token.expiry is None or auth_token.expiry > timezone.now():
+                if knox_settings.AUTO_REFRESH and auth_token.expiry:
+                    self.refresh_cached_token(key, user, auth_token)
+                return self.validate_user(auth_token)
+            # Expired: knox deletes the token and rejects the request
+            cache.delete(key)
+
+        user, auth_token = super().authenticate_credentials(token)
+        cache.set(key, (user, auth_token), settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, auth_token
+
+    def refresh_cached_token(self, key, user, auth_token):
+        new_expiry = timezone.now() + knox_settings.TOKEN_TTL
+        interval = knox_settings.MIN_REFRESH_INTERVAL
+        if new_expiry - auth_token.expiry <= timedelta(seconds=interval):
+            return
+        # Only one process writes per token and interval
+        if not cache.add(f'{key}:refresh', True, interval):
+            return
+        AuthToken.objects.filter(digest=auth_token.digest).update(expiry=new_expiry)
+        auth_token.expiry = new_expiry
+        cache.set(key, (user, auth_token), settings.AUTH_TOKEN_CACHE_TIMEOUT)
@@ -1,8 +1,24 @@
 from django_elasticsearch_dsl import fields
 from django_elasticsearch_dsl import Document as ElasticsearchDocument
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import analyzer, char_filter, token_filter
 from users.models import *
 
+# OCR output splits words across lines with hyphens and is full of stray
+# single characters; join the former and drop the latter
+ocr_text_analyzer = analyzer(
+    'ocr_text',
+    tokenizer='standard',
+    char_filter=[
+        char_filter('ocr_dehyphenate', type='pattern_replace', pattern=r'(\w)-\s*\n\s*(\w)', replacement='$1$2'),
+    ],
+    filter=[
+        'lowercase',
+        'asciifolding',
+        token_filter('ocr_min_length', type='length', min=2),
+    ],
+)
+
 @registry.register_document
 class UserDocument(ElasticsearchDocument):
     class Index:
@@ -51,6 +67,9 @@ class DocumentDocument(ElasticsearchDocument):
         'description': fields.TextField(),
     })
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('project')
+
     def prepare_project(self, instance):
         return {
             'name': instance.project.name,
@@ -66,10 +85,15 @@ class OCRTextDocument(ElasticsearchDocument):
 
     class Django:
         model = OCRText
-        fields = [
-            'text',
-            #'emails',
-        ]
+        fields = []
+
+    text = fields.TextField(analyzer=ocr_text_analyzer)
+    emails = fields.KeywordField(multi=True)
+
+    # Top-level keyword/integer fields so searches can filter on them in
+    # filter context, which Elasticsearch caches
+    project_id = fields.IntegerField()
+    file_type = fields.KeywordField()
 
     document = fields.ObjectField(properties={
         'file_name': fields.TextField(),
@@ -78,6 +102,21 @@ class OCRTextDocument(ElasticsearchDocument):
         'document_id': fields.IntegerField(),  # Adding document ID field
     })
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('document', 'document__documentmeta')
+
+    def prepare_emails(self, instance):
+        return sorted({email.lower() for email in instance.emails})
+
+    def prepare_project_id(self, instance):
+        return instance.document.project_id
+
+    def prepare_file_type(self, instance):
+        try:
+            return instance.document.documentmeta.file_type
+        except DocumentMeta.DoesNotExist:
+            return None
+
     def prepare_document(self, instance):
         document_instance = instance.document
         return {
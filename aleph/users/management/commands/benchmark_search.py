@@ -0,0 +1,48 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.search_backends import SEARCH_BACKENDS, get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Compare latency and hit counts of the search backends on the same queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help="Queries to run")
+        parser.add_argument('--backends', nargs='+', choices=sorted(SEARCH_BACKENDS),
+                            help="Backends to compare, by default all available ones")
+        parser.add_argument('--runs', type=int, default=20, help="Timed runs per query and backend")
+        parser.add_argument('--size', type=int, default=10)
+        parser.add_argument('--project-id', type=int)
+
+    def handle(self, *args, **options):
+        # A backend without an up to date index would be timed on empty results
+        backends = []
+        for name in options['backends'] or sorted(SEARCH_BACKENDS):
+            reason = SEARCH_BACKENDS[name].unavailable_reason()
+            if reason and options['backends']:
+                raise CommandError(f"Search backend {name} is not available: {reason}")
+            if reason:
+                self.stderr.write(self.style.WARNING(f"Skipping search backend {name}: {reason}"))
+            else:
+                backends.append(name)
+
+        for query in options['queries']:
+            self.stdout.write(f"Query: {query!r}")
+            for name in backends:
+                backend = get_search_backend(name)
+                search = lambda: backend.search(query, options['size'], project_id=options['project_id'])
+                found = search()  # warm up caches and connections
+                timings = []
+                for _ in range(options['runs']):
+                    started = time.perf_counter()
+                    search()
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f"  {name:<14} total={found['total']:<8} "
+                    f"p50={statistics.median(timings):.1f}ms p95={p95:.1f}ms max={timings[-1]:.1f}ms"
+                )
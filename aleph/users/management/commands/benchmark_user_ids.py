@@ -0,0 +1,71 @@
+import random
+import string
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+from users.user_ids import allocate_user_ids
+
+# The legacy generator gives up after this many probes instead of looping
+# forever once its 2,340 ids are used up
+LEGACY_MAX_ATTEMPTS = 10000
+
+
+def legacy_user_id():
+    for _ in range(LEGACY_MAX_ATTEMPTS):
+        generated_id = str(random.randint(10, 99)) + random.choice(string.ascii_uppercase)
+        if not User.objects.filter(user_id=generated_id).exists():
+            return generated_id
+    return None
+
+
+class Command(BaseCommand):
+    help = ("Time bulk user creation with the legacy random user_id generator and with the "
+            "sequence-backed allocator. All users are rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help="Users created per strategy")
+
+    def _new_user(self, run, i, user_id=''):
+        return User(user_id=user_id, email=f'benchmark-{run}-{i}@example.com', first_name='Benchmark',
+                    last_name='User', group='review', status='active')
+
+    def _legacy(self, run, count):
+        for i in range(count):
+            user_id = legacy_user_id()
+            if user_id is None:
+                return i
+            # bulk_create skips save(), which would allocate a new-format id
+            User.objects.bulk_create([self._new_user(run, i, user_id)])
+        return count
+
+    def _allocator(self, run, count):
+        for i in range(count):
+            self._new_user(run, i).save()
+        return count
+
+    def _allocator_bulk(self, run, count):
+        User.objects.bulk_create(
+            [self._new_user(run, i, user_id) for i, user_id in enumerate(allocate_user_ids(count))],
+            batch_size=1000
+        )
+        return count
+
+    def handle(self, *args, **options):
+        count = options['count']
+        for name, create in [('legacy', self._legacy), ('allocator', self._allocator),
+                             ('allocator-bulk', self._allocator_bulk)]:
+            with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                created = create(uuid.uuid4().hex[:8], count)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            note = '' if created == count else f" (gave up after {created}, id space exhausted)"
+            self.stdout.write(
+                f"{name:<15} users={created:<7} total={elapsed * 1000:.0f}ms "
+                f"per_user={elapsed * 1000 / max(created, 1):.2f}ms queries={len(queries)}{note}"
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from users.models import DocumentEmail, OCRText
+
+
+class Command(BaseCommand):
+    help = "Fill the DocumentEmail lookup table from OCRText.emails of documents stored before it existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                OCRText.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'document_id', 'emails')[:options['chunk_size']]
+            )
+            if not rows:
+                break
+            DocumentEmail.objects.bulk_create(
+                [DocumentEmail(document_id=document_id, email=address)
+                 for _, document_id, emails in rows
+                 for address in sorted({DocumentEmail.normalize(email) for email in emails if email.strip()})],
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+            indexed += len(rows)
+            last_pk = rows[-1][0]
+        self.stdout.write(self.style.SUCCESS(f"Indexed emails of {indexed} documents"))
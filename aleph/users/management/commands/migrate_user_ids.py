@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import User
+from users.user_ids import advance_sequence, allocate_user_ids, decode_user_id
+
+
+class Command(BaseCommand):
+    help = ("Move the user_id sequence past every existing id in the current format, "
+            "and optionally give users with legacy ids a new one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rewrite-legacy', action='store_true',
+                            help="Replace ids not in the current format (user_id is visible to clients)")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        highest = 0
+        legacy_pks = []
+        for pk, user_id in User.objects.order_by('pk').values_list('pk', 'user_id').iterator(chunk_size=options['chunk_size']):
+            number = decode_user_id(user_id)
+            if number is None:
+                legacy_pks.append(pk)
+            else:
+                highest = max(highest, number)
+        advance_sequence(highest)
+        self.stdout.write(f"Sequence continues after {highest}, {len(legacy_pks)} users have legacy ids")
+
+        if not options['rewrite_legacy']:
+            return
+        for start in range(0, len(legacy_pks), options['chunk_size']):
+            chunk = legacy_pks[start:start + options['chunk_size']]
+            with transaction.atomic():
+                users = list(User.objects.filter(pk__in=chunk).select_for_update())
+                for user, user_id in zip(users, allocate_user_ids(len(users))):
+                    user.user_id = user_id
+                User.objects.bulk_update(users, ['user_id'])
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {len(legacy_pks)} legacy ids"))
@@ -0,0 +1,118 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django_elasticsearch_dsl.registries import registry
+from elasticsearch.helpers import parallel_bulk
+from elasticsearch_dsl.connections import connections
+
+from users.tasks import drain_search_index_queue, search_index_flush_paused
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild search indexes without downtime: build a new versioned index, "
+        "load it from the database in keyset-paginated chunks with parallel bulk "
+        "workers, then atomically point the index alias at it. Search index "
+        "updates are held in SearchIndexQueue while the new index is built and "
+        "sent to it right after the swap."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('indexes', nargs='*', help="Index names to rebuild (default: all registered)")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows read and sent per bulk request")
+        parser.add_argument('--workers', type=int, default=4, help="Parallel bulk worker threads")
+        parser.add_argument('--keep-old', action='store_true', help="Keep the previous index after the swap")
+
+    def handle(self, *args, **options):
+        documents = {doc._index._name: doc for doc in registry.get_documents()}
+        names = options['indexes'] or sorted(documents)
+        unknown = set(names) - set(documents)
+        if unknown:
+            raise CommandError(f"Unknown indexes: {', '.join(sorted(unknown))}")
+
+        for alias in names:
+            # Updates flushed to the old index during the build would be lost
+            # with it, so they wait in the queue until the alias has moved
+            with search_index_flush_paused():
+                self.rebuild(alias, documents[alias], options)
+            try:
+                caught_up = drain_search_index_queue()['flushed']
+            except Exception as e:
+                self.stderr.write(self.style.WARNING(
+                    f"Queued updates not yet sent to {alias}, flush_search_index will retry them: {e}"
+                ))
+            else:
+                self.stdout.write(f"{alias}: {caught_up} queued updates sent after the swap")
+
+    def rebuild(self, alias, doc_class, options):
+        client = connections.get_connection()
+        doc = doc_class()
+        new_name = f"{alias}_{timezone.now().strftime('%Y%m%d%H%M%S')}"
+
+        # Same mappings and settings as the registered index, without refreshes while loading
+        doc._index.clone(name=new_name).create()
+        client.indices.put_settings(index=new_name, settings={'index': {'refresh_interval': '-1'}})
+
+        started = time.monotonic()
+        indexed = 0
+        failed = 0
+        for ok, item in parallel_bulk(
+            client,
+            self.actions(doc, new_name, options['chunk_size']),
+            thread_count=options['workers'],
+            chunk_size=options['chunk_size'],
+            raise_on_error=False
+        ):
+            if ok:
+                indexed += 1
+            else:
+                failed += 1
+                if failed <= 10:
+                    self.stderr.write(f"Failed to index into {new_name}: {item}")
+        elapsed = time.monotonic() - started
+
+        if failed:
+            client.indices.delete(index=new_name)
+            raise CommandError(f"{failed} rows failed to index into {new_name}, alias {alias} left unchanged")
+
+        client.indices.put_settings(index=new_name, settings={'index': {'refresh_interval': None}})
+        client.indices.refresh(index=new_name)
+        old_indexes = self.swap_alias(client, alias, new_name)
+        if not options['keep_old']:
+            for old_index in old_indexes:
+                client.indices.delete(index=old_index)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{alias} -> {new_name}: {indexed} rows in {elapsed:.1f}s "
+            f"({indexed / elapsed if elapsed else indexed:.0f} rows/sec)"
+        ))
+
+    def actions(self, doc, index_name, chunk_size):
+        # Keyset pagination on the primary key stays fast however deep the table is
+        queryset = doc.get_queryset().order_by('pk')
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(chunk[:chunk_size])
+            if not rows:
+                return
+            for instance in rows:
+                yield {'_index': index_name, '_id': instance.pk, '_source': doc.prepare(instance)}
+            last_pk = rows[-1].pk
+
+    def swap_alias(self, client, alias, new_name):
+        """
+        Point alias at new_name in one atomic request and return the indexes it
+        pointed at before. A concrete index still named like the alias (from
+        before aliases were used) is removed in the same request.
+        """
+        actions = [{'add': {'index': new_name, 'alias': alias}}]
+        old_indexes = []
+        if client.indices.exists_alias(name=alias):
+            old_indexes = list(client.indices.get_alias(name=alias))
+            actions += [{'remove': {'index': index, 'alias': alias}} for index in old_indexes]
+        elif client.indices.exists(index=alias):
+            actions.append({'remove_index': {'index': alias}})
+        client.indices.update_aliases(actions=actions)
+        return old_indexes
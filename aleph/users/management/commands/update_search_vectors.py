@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+
+from users.models import OCRText
+
+
+class Command(BaseCommand):
+    help = "Fill OCRText.search_vector for rows stored before the Postgres search backend existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help="Recompute every row, not only missing vectors")
+
+    def handle(self, *args, **options):
+        queryset = OCRText.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        updated = 0
+        last_pk = 0
+        while True:
+            ids = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            updated += OCRText.objects.filter(pk__in=ids).update(
+                search_vector=SearchVector('text', config=settings.POSTGRES_SEARCH_CONFIG)
+            )
+            last_pk = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors of {updated} rows"))
@@ -1,8 +1,13 @@
 import random
 import string
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, User, PermissionsMixin
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from users.user_ids import allocate_user_id
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -67,19 +72,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         super().save(*args, **kwargs)
 
     def _generate_user_id(self):
-        while True:
-            # Generate a random 2-digit number
-            number_part = str(random.randint(10, 99))
-
-            # Generate a random alphabet
-            alphabet_part = random.choice(string.ascii_uppercase)
-
-            # Concatenate the number and alphabet parts
-            generated_id = number_part + alphabet_part
-
-            # Check if the generated ID already exists in the database
-            if not User.objects.filter(user_id=generated_id).exists():
-                return generated_id
+        # Sequence-backed, see users/user_ids.py. Bulk inserts, which skip
+        # save(), take their ids from allocate_user_ids().
+        return allocate_user_id()
 
     def __str__(self):
         return f"{self.email}"
@@ -121,6 +116,7 @@ class Document(models.Model):
     file_name = models.CharField(max_length=500, null=True, blank=True)
     file_url = models.URLField(max_length=500, null=True, blank=True)  # Store the S3 URL here
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='documents')
 
     def __str__(self):
@@ -146,6 +142,10 @@ class PageImage(models.Model):
     page_number = models.IntegerField(null=True, blank=True)
     image_url = models.URLField(max_length=500, null=True, blank=True)  # Use URLField to store the S3 URL
 
+    class Meta:
+        # Concurrent first requests for a lazily rendered page share one row
+        unique_together = ('document', 'page_number')
+
     def __str__(self):
         return f"Image for doucment id:{self.document.id} - Page {self.page_number}"
 
@@ -153,7 +153,168 @@ class OCRText(models.Model):
     document = models.OneToOneField(Document, on_delete=models.CASCADE)
     text = models.TextField()
     emails = ArrayField(models.CharField(max_length=255), default=list)
+    # Entity type -> values found in the text, see helpers/entities.py
+    entities = models.JSONField(default=dict)
+    # OCR decision per PDF page and their totals, see helpers.ocr.summarize_ocr_decisions
+    ocr_stats = models.JSONField(default=dict)
+    # Maintained from text on save, used by the Postgres search backend
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'])]
+
+    def update_search_vector(self):
+        OCRText.objects.filter(pk=self.pk).update(
+            search_vector=SearchVector('text', config=settings.POSTGRES_SEARCH_CONFIG)
+        )
 
     def __str__(self):
         return f"OCR Text for {self.document}"
 
+class DocumentEmail(models.Model):
+    """
+    Normalized, deduplicated email addresses found in a document's OCR text,
+    indexed for address-to-document lookups.
+    """
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='email_index')
+    email = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        unique_together = ('document', 'email')
+
+    @staticmethod
+    def normalize(email):
+        return email.strip().lower()
+
+    @classmethod
+    def index_document(cls, document, emails):
+        addresses = {cls.normalize(email) for email in emails if email and email.strip()}
+        cls.objects.bulk_create(
+            [cls(document=document, email=address) for address in sorted(addresses)],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def __str__(self):
+        return f"{self.email} in document id:{self.document_id}"
+
+class OCRPageText(models.Model):
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='page_texts')
+    page_number = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['page_number']
+        unique_together = ('document', 'page_number')
+
+    def __str__(self):
+        return f"OCR Text for document id:{self.document_id} - Page {self.page_number}"
+
+
+
+class OCRResultCache(models.Model):
+    """
+    Extraction results keyed by a digest of the file bytes alone, so the same
+    file uploaded under another name or into another project is not OCRed again.
+    """
+    content_digest = models.CharField(max_length=64, unique=True, db_index=True)
+    engine_version = models.CharField(max_length=100)
+    text = models.TextField()
+    emails = ArrayField(models.CharField(max_length=255), default=list)
+    entities = models.JSONField(default=dict)
+    pages = ArrayField(models.TextField(), default=list)
+    ocr_stats = models.JSONField(default=dict)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @classmethod
+    def lookup(cls, content_digest, engine_version):
+        entry = cls.objects.filter(content_digest=content_digest, engine_version=engine_version).first()
+        if entry:
+            cls.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+        return entry
+
+    @classmethod
+    def store(cls, content_digest, engine_version, text, emails, page_count=None, pages=None, entities=None,
+              ocr_stats=None):
+        entry, _ = cls.objects.update_or_create(
+            content_digest=content_digest,
+            defaults={
+                'engine_version': engine_version,
+                'text': text,
+                'emails': emails,
+                'entities': entities or {},
+                'pages': pages or [],
+                'ocr_stats': ocr_stats or {},
+                'page_count': page_count,
+                'last_used_at': timezone.now(),
+            }
+        )
+        cls.evict()
+        return entry
+
+    @classmethod
+    def evict(cls, max_entries=None):
+        # Drop the least recently used entries beyond the configured size
+        max_entries = settings.OCR_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        stale_ids = cls.objects.order_by('-last_used_at').values_list('id', flat=True)[max_entries:]
+        cls.objects.filter(id__in=list(stale_ids)).delete()
+
+    def __str__(self):
+        return f"OCR cache for {self.content_digest}"
+
+
+class OCRPageResult(models.Model):
+    """
+    Extraction result of one PDF page, written by the extract_document_page_range
+    tasks a large PDF is split into and merged into OCRResultCache, in page
+    order, by finalize_document.
+    """
+    content_digest = models.CharField(max_length=64, db_index=True)
+    engine_version = models.CharField(max_length=100)
+    page_number = models.PositiveIntegerField()
+    text = models.TextField()
+    ocr = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['page_number']
+        unique_together = ('content_digest', 'engine_version', 'page_number')
+
+    def __str__(self):
+        return f"OCR result for {self.content_digest} - Page {self.page_number}"
+
+
+class SearchIndexQueue(models.Model):
+    """
+    Objects whose Elasticsearch documents are out of date. Rows are written in
+    the same transaction as the change and removed once flush_search_index has
+    sent them to Elasticsearch.
+    """
+    ACTION_CHOICES = (
+        ('index', 'Index'),
+        ('delete', 'Delete'),
+    )
+    app_label = models.CharField(max_length=100)
+    model_name = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('app_label', 'model_name', 'object_id')
+
+    @classmethod
+    def enqueue(cls, instance, action):
+        # A later change to the same object replaces its pending action
+        cls.objects.bulk_create(
+            [cls(app_label=instance._meta.app_label, model_name=instance._meta.model_name,
+                 object_id=str(instance.pk), action=action)],
+            update_conflicts=True,
+            unique_fields=['app_label', 'model_name', 'object_id'],
+            update_fields=['action']
+        )
+
+    def __str__(self):
+        return f"{self.action} {self.app_label}.{self.model_name}:{self.object_id}"
@@ -0,0 +1,26 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the primary key. Each page is a `WHERE id > last`
+    range scan, so it stays fast at any depth, unlike OFFSET.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def paginate_if_requested(view, request, queryset, serializer_class):
+    """
+    List endpoints built on APIView return every row unless the client opts in
+    to pagination with ?cursor= or ?page_size=. Returns the paginated Response,
+    or None when the client did not ask for pages.
+    """
+    paginator = KeysetPagination()
+    if paginator.cursor_query_param not in request.query_params and \
+            paginator.page_size_query_param not in request.query_params:
+        return None
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,94 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _state_keys(scope, object_id):
+    return f'response-cache-version:{scope}:{object_id}', f'response-cache-modified:{scope}:{object_id}'
+
+def get_version(scope, object_id):
+    """
+    Current (version, last modified) of a document or project. The version is
+    a counter that changes on every invalidation; the last modified time, in
+    whole seconds, is only used for Last-Modified.
+    """
+    version_key, modified_key = _state_keys(scope, object_id)
+    state = cache.get_many([version_key, modified_key])
+    # Unknown or evicted: start from the current time in nanoseconds, so a
+    # restarted counter does not reach versions used before. Other processes
+    # may have raced us to it.
+    if version_key not in state:
+        cache.add(version_key, time.time_ns(), None)
+    if modified_key not in state:
+        cache.add(modified_key, int(time.time()), None)
+    if len(state) < 2:
+        state = cache.get_many([version_key, modified_key])
+    return state[version_key], state[modified_key]
+
+def _bump(scope, object_id):
+    version_key, modified_key = _state_keys(scope, object_id)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, time.time_ns(), None)
+    cache.set(modified_key, int(time.time()), None)
+
+def invalidate(scope, object_id):
+    """
+    Start a new version once the current transaction commits. Responses cached
+    under the old version are never read again and expire on their own.
+    """
+    if object_id is None:
+        return
+    transaction.on_commit(lambda: _bump(scope, object_id))
+
+
+def cached_response(scope, url_kwarg):
+    """
+    Read-through cache for the GET method of an APIView whose data belongs to
+    one document or project, identified by the url_kwarg URL parameter.
+
+    Successful responses are cached per URL under the object's version and
+    carry an ETag and Last-Modified, so matching conditional requests get a
+    304. Other responses, including streamed ones, pass through uncached.
+    The wrapped method runs after authentication and permission checks.
+
+    Invalidations from other processes (e.g. Celery ingest) only reach a
+    shared cache, so without one (RESPONSE_CACHE_ENABLED) nothing is cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return method(view, request, *args, **kwargs)
+            version, last_modified = get_version(scope, kwargs[url_kwarg])
+            url_hash = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+            key = f'response-cache:{view.__class__.__name__}:{scope}:{kwargs[url_kwarg]}:{version}:{url_hash}'
+            headers = {
+                'ETag': f'"{hashlib.sha1(key.encode()).hexdigest()}"',
+                'Last-Modified': http_date(last_modified),
+            }
+
+            if_none_match = request.headers.get('If-None-Match')
+            if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            if (if_none_match and headers['ETag'] in [tag.strip() for tag in if_none_match.split(',')]) or \
+                    (not if_none_match and if_modified_since is not None and if_modified_since >= last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            data = cache.get(key)
+            if data is None:
+                response = method(view, request, *args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+            return Response(data, status=status.HTTP_200_OK, headers=headers)
+        return wrapper
+    return decorator
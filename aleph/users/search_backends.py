@@ -0,0 +1,147 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import DecimalField, F, Q
+from django.db.models.functions import Cast
+
+from users.documents import OCRTextDocument
+from users.models import OCRText
+
+HIGHLIGHT_FRAGMENT_SIZE = 150
+HIGHLIGHT_FRAGMENTS = 3
+HIGHLIGHT_DELIMITER = ' ... '
+
+
+class SearchBackend:
+    """
+    Full-text search over OCRText used by OCRTextSearchAPIView.
+
+    search() returns a dict with 'total', 'results' and 'next_search_after'.
+    Each result holds the document fields, 'emails', 'project_id',
+    'file_type', 'score' and up to HIGHLIGHT_FRAGMENTS 'highlights', but never
+    the full text. Results are ordered by score, then document id, and can be
+    paged with offset or with the previous page's next_search_after.
+    """
+    max_window = None
+
+    @classmethod
+    def unavailable_reason(cls):
+        # Why the backend cannot answer searches with this configuration, or None
+        return None
+
+    def search(self, query, size, offset=0, search_after=None, project_id=None, file_type=None):
+        raise NotImplementedError
+
+
+class ElasticsearchBackend(SearchBackend):
+    max_window = 10000  # Elasticsearch index.max_result_window
+
+    def search(self, query, size, offset=0, search_after=None, project_id=None, file_type=None):
+        search = OCRTextDocument.search()
+        # Filters run in filter context: not scored, and cached by Elasticsearch
+        if project_id:
+            search = search.filter('term', project_id=project_id)
+        if file_type:
+            search = search.filter('term', file_type=file_type)
+        search = (search
+                  .query("multi_match", query=query, fields=['text'])
+                  .source(excludes=['text'])
+                  .highlight('text', fragment_size=HIGHLIGHT_FRAGMENT_SIZE, number_of_fragments=HIGHLIGHT_FRAGMENTS)
+                  .sort('_score', {'document.document_id': 'asc'})
+                  .extra(track_total_hits=True))
+        if search_after is not None:
+            search = search.extra(search_after=search_after, size=size)
+        else:
+            search = search[offset:offset + size]
+
+        response = search.execute()
+        results = []
+        for hit in response:
+            data_dict = hit.to_dict()
+            data_dict['score'] = hit.meta.score
+            data_dict['highlights'] = list(hit.meta.highlight.text) if 'highlight' in hit.meta else []
+            results.append(data_dict)
+
+        return {
+            'total': response.hits.total.value,
+            'results': results,
+            'next_search_after': list(response.hits[-1].meta.sort) if len(response.hits) == size else None,
+        }
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Searches the stored OCRText.search_vector through its GIN index. Like the
+    Elasticsearch multi_match query, a document matches any of the query terms.
+    """
+    @classmethod
+    def unavailable_reason(cls):
+        if not settings.POSTGRES_SEARCH_VECTORS:
+            return "OCRText.search_vector is not maintained, set POSTGRES_SEARCH_VECTORS=1 and run update_search_vectors"
+        return None
+
+    def search(self, query, size, offset=0, search_after=None, project_id=None, file_type=None):
+        config = settings.POSTGRES_SEARCH_CONFIG
+        search_query = reduce(or_, [SearchQuery(term, config=config) for term in query.split() or [query]])
+
+        queryset = OCRText.objects.filter(search_vector=search_query)
+        if project_id:
+            queryset = queryset.filter(document__project_id=project_id)
+        if file_type:
+            queryset = queryset.filter(document__documentmeta__file_type=file_type)
+        total = queryset.count()
+
+        # Rank is compared exactly when paging with search_after, so it is
+        # cast from real to numeric rather than round-tripped through a float
+        queryset = queryset.annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), DecimalField(max_digits=20, decimal_places=10))
+        )
+        if search_after is not None:
+            rank, document_id = Decimal(str(search_after[0])), search_after[1]
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, document_id__gt=document_id))
+
+        queryset = (queryset
+                    .annotate(headline=SearchHeadline(
+                        'text', search_query, config=config, start_sel='<em>', stop_sel='</em>',
+                        max_fragments=HIGHLIGHT_FRAGMENTS, max_words=HIGHLIGHT_FRAGMENT_SIZE // 6,
+                        min_words=HIGHLIGHT_FRAGMENT_SIZE // 15, fragment_delimiter=HIGHLIGHT_DELIMITER))
+                    .select_related('document', 'document__documentmeta')
+                    .defer('text', 'search_vector')
+                    .order_by('-rank', 'document_id'))
+        rows = list(queryset[:size] if search_after is not None else queryset[offset:offset + size])
+
+        results = []
+        for ocr_text in rows:
+            document = ocr_text.document
+            meta = getattr(document, 'documentmeta', None)
+            results.append({
+                'document': {
+                    'file_name': document.file_name,
+                    'file_url': document.file_url,
+                    'project_id': document.project_id,
+                    'document_id': document.id,
+                },
+                'emails': sorted({email.lower() for email in ocr_text.emails}),
+                'project_id': document.project_id,
+                'file_type': meta.file_type if meta else None,
+                'score': float(ocr_text.rank),
+                'highlights': [fragment for fragment in ocr_text.headline.split(HIGHLIGHT_DELIMITER) if fragment],
+            })
+
+        return {
+            'total': total,
+            'results': results,
+            'next_search_after': [rows[-1].rank, rows[-1].document_id] if len(rows) == size else None,
+        }
+
+
+SEARCH_BACKENDS = {
+    'elasticsearch': ElasticsearchBackend,
+    'postgres': PostgresSearchBackend,
+}
+
+def get_search_backend(name=None):
+    return SEARCH_BACKENDS[name or settings.SEARCH_BACKEND]()
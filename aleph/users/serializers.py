@@ -100,7 +100,7 @@ class DocumentMetaSerializer(serializers.ModelSerializer):
 class OCRTextSerializer(serializers.ModelSerializer):
     class Meta:
         model = OCRText
-        fields = ['document', 'text', 'emails']
+        fields = ['document', 'text', 'emails', 'entities']
 
     def to_representation(self, instance):
         # If 'instance' is a dictionary (from Elasticsearch), return it directly
@@ -109,6 +109,18 @@ class OCRTextSerializer(serializers.ModelSerializer):
         # Otherwise, serialize the model instance as usual
         return super().to_representation(instance)
 
+class OCRPageTextSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OCRPageText
+        fields = ['page_number', 'text']
+
+class EmailLookupSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000
+    )
+
 class MultiplePageDocumentSerializer(serializers.Serializer):
     files = serializers.ListField(
         child=serializers.FileField()
@@ -128,6 +140,9 @@ class ProjectMultipleSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'total_documents']
 
     def get_total_documents(self, obj):
+        # Annotated by MultipleProjectDetailsAPIView; count only as a fallback
+        if hasattr(obj, 'document_count'):
+            return obj.document_count
         return obj.documents.count()
 
 class PotentialUserSerializer(serializers.ModelSerializer):
@@ -0,0 +1,106 @@
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
+from knox.models import AuthToken
+
+from users.authentication import invalidate_token
+from users.models import Document, DocumentMeta, OCRPageText, OCRText, PageImage, Project, SearchIndexQueue, User
+from users.response_cache import invalidate
+
+FLUSH_SCHEDULED_KEY = 'search-index-flush-scheduled'
+
+
+class QueuedSignalProcessor(RealTimeSignalProcessor):
+    """
+    Records changed objects in SearchIndexQueue instead of calling
+    Elasticsearch during the save. After the transaction commits a
+    flush_search_index task is scheduled, at most once per
+    SEARCH_INDEX_FLUSH_INTERVAL, or right away once SEARCH_INDEX_BATCH_SIZE
+    changes have been queued by this process.
+    """
+    pending = 0
+
+    def handle_save(self, sender, instance, **kwargs):
+        self._enqueue(instance, 'index')
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        pass
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self._enqueue(instance, 'delete')
+
+    def _enqueue(self, instance, action):
+        if instance.__class__ not in registry.get_models():
+            return
+        SearchIndexQueue.enqueue(instance, action)
+        transaction.on_commit(self._schedule_flush)
+
+    def _schedule_flush(self):
+        from users.tasks import drain_search_index_queue, flush_search_index
+        # Without a Celery worker (outside production) index right away, once.
+        # Entries that fail stay queued for the next save or beat flush.
+        if os.getenv('ENV') != 'PRODUCTION':
+            try:
+                drain_search_index_queue()
+            except Exception as e:
+                print(f"Error flushing search index: {e}")
+            return
+        QueuedSignalProcessor.pending += 1
+        if QueuedSignalProcessor.pending >= settings.SEARCH_INDEX_BATCH_SIZE:
+            QueuedSignalProcessor.pending = 0
+            flush_search_index.delay()
+        elif cache.add(FLUSH_SCHEDULED_KEY, True, timeout=settings.SEARCH_INDEX_FLUSH_INTERVAL):
+            QueuedSignalProcessor.pending = 0
+            flush_search_index.apply_async(countdown=settings.SEARCH_INDEX_FLUSH_INTERVAL)
+
+
+@receiver(post_save, sender=OCRText)
+def update_ocr_text_search_vector(sender, instance, update_fields=None, **kwargs):
+    # Only rows whose text changed are re-vectorized, and only when the
+    # Postgres search backend is in use
+    if not settings.POSTGRES_SEARCH_VECTORS:
+        return
+    if update_fields is None or 'text' in update_fields:
+        instance.update_search_vector()
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_responses(sender, instance, **kwargs):
+    invalidate('project', instance.pk)
+
+@receiver([post_save, post_delete], sender=Document)
+def invalidate_document_responses(sender, instance, **kwargs):
+    invalidate('document', instance.pk)
+    invalidate('project', instance.project_id)
+
+@receiver([post_save, post_delete], sender=DocumentMeta)
+@receiver([post_save, post_delete], sender=OCRText)
+@receiver([post_save, post_delete], sender=OCRPageText)
+@receiver([post_save, post_delete], sender=PageImage)
+def invalidate_document_part_responses(sender, instance, **kwargs):
+    # Project document lists include DocumentMeta fields
+    invalidate('document', instance.document_id)
+    if sender is DocumentMeta:
+        project_id = Document.objects.filter(pk=instance.document_id).values_list('project_id', flat=True).first()
+        invalidate('project', project_id)
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Logout, logout-all and cascades from a deleted user
+    transaction.on_commit(partial(invalidate_token, instance.digest))
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created=False, **kwargs):
+    # Cached tokens carry the user, e.g. is_active and group used by permissions
+    if created:
+        return
+    digests = list(AuthToken.objects.filter(user=instance).values_list('digest', flat=True))
+    transaction.on_commit(lambda: [invalidate_token(digest) for digest in digests])
@@ -0,0 +1,150 @@
+import re
+import zlib
+
+from django.db import connection
+from django.db.models import F, Func, IntegerField
+from django.http import HttpResponse, StreamingHttpResponse
+
+from users.models import OCRPageText, OCRText
+
+# Bytes per chunk when streaming text stored in a single OCRText row
+OCR_STREAM_CHUNK_BYTES = 64 * 1024
+
+# Pages are joined with this separator, matching OCRText.text
+PAGE_SEPARATOR = b"\n"
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class OctetLength(Func):
+    function = 'octet_length'
+    output_field = IntegerField()
+
+
+class OCRTextReader:
+    """
+    Reads a document's OCR text as UTF-8 bytes without loading it whole.
+
+    Text is streamed from the per-page rows when the document has them.
+    Otherwise the requested range is read from the OCRText row in one query
+    and sent in chunks.
+    """
+    def __init__(self, document_id):
+        self.document_id = document_id
+        self.pages = list(
+            OCRPageText.objects.filter(document_id=document_id)
+            .annotate(size=OctetLength(F('text')))
+            .values_list('id', 'size')
+        )
+        if self.pages:
+            self.ocr_text_id = None
+            self.size = sum(size for _, size in self.pages) + len(PAGE_SEPARATOR) * (len(self.pages) - 1)
+        else:
+            row = (OCRText.objects.filter(document_id=document_id)
+                   .annotate(size=OctetLength(F('text')))
+                   .values_list('id', 'size').first())
+            if row is None:
+                raise OCRText.DoesNotExist
+            self.ocr_text_id, self.size = row
+
+    def iter_bytes(self, start=0, end=None):
+        """
+        Yield the bytes in [start, end] (inclusive, like an HTTP Range).
+        """
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        if start > end:
+            return
+        if self.pages:
+            yield from self._iter_pages(start, end)
+        else:
+            yield from self._iter_row(start, end)
+
+    def _iter_pages(self, start, end):
+        # Byte offset of each page, counting the separator that follows it
+        offsets = {}
+        position = 0
+        for index, (page_id, size) in enumerate(self.pages):
+            length = size if index == len(self.pages) - 1 else size + len(PAGE_SEPARATOR)
+            if position <= end and position + length > start:
+                offsets[page_id] = position
+            position += length
+
+        last_page_id = self.pages[-1][0]
+        pages = (OCRPageText.objects.filter(id__in=list(offsets))
+                 .order_by('page_number').only('id', 'text').iterator(chunk_size=16))
+        for page in pages:
+            data = page.text.encode('utf-8')
+            if page.id != last_page_id:
+                data += PAGE_SEPARATOR
+            page_start = offsets[page.id]
+            yield data[max(start - page_start, 0):end - page_start + 1]
+
+    def _iter_row(self, start, end):
+        # A single query: every substring() of the row detoasts and converts
+        # the whole text, so reading it chunk by chunk would be quadratic
+        query = (f"SELECT substring(convert_to(text, 'UTF8') from %s for %s) "
+                 f"FROM {OCRText._meta.db_table} WHERE id = %s")
+        with connection.cursor() as cursor:
+            cursor.execute(query, [start + 1, end - start + 1, self.ocr_text_id])
+            data = memoryview(cursor.fetchone()[0])
+        for position in range(0, len(data), OCR_STREAM_CHUNK_BYTES):
+            yield bytes(data[position:position + OCR_STREAM_CHUNK_BYTES])
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single 'bytes=start-end' range. Returns (start, end), None when
+    the header is absent or not a single byte range, or False when the range
+    cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_ocr_text(request, document_id):
+    """
+    Stream a document's OCR text as text/plain, honouring a single HTTP Range
+    and gzip when the client accepts it. Raises OCRText.DoesNotExist.
+    """
+    reader = OCRTextReader(document_id)
+    byte_range = parse_range_header(request.META.get('HTTP_RANGE'), reader.size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{reader.size}"
+        return response
+
+    content_type = 'text/plain; charset=utf-8'
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(reader.iter_bytes(start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{reader.size}"
+        response['Content-Length'] = str(end - start + 1)
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = StreamingHttpResponse(_gzip(reader.iter_bytes()), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(reader.iter_bytes(), content_type=content_type)
+        response['Content-Length'] = str(reader.size)
+    response['Accept-Ranges'] = 'bytes'
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -1,44 +1,289 @@
 # tasks.py
-from celery import shared_task
+from celery import shared_task, chord
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django_elasticsearch_dsl.registries import registry
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl.connections import connections
 from helpers.s3 import *
 from helpers.checksum import *
 from helpers.ocr import *
+from helpers.render import IMAGE_FORMATS, PAGE_IMAGE_FORMAT, render_page_image
+import tempfile
 import time
+from contextlib import contextmanager
 import fitz  # PyMuPDF
 from users.models import *
 
-@shared_task
-def process_document(project_id, file_name, temp_file_path, bucket_name, unique_key):
-    status = {
-        'error': None
-    }
+# Number of pages rendered by a single render_document_pages task
+PAGE_RENDER_CHUNK_SIZE = int(os.getenv('PAGE_RENDER_CHUNK_SIZE', 25))
+
+# 'eager' renders every page during ingest, 'lazy' renders a page the first
+# time it is requested through DocumentPageImageAPIView
+PAGE_RENDER_MODE = os.getenv('PAGE_RENDER_MODE', 'eager')
+
+# Originals downloaded for on-demand rendering are kept here for reuse
+PAGE_RENDER_CACHE_DIR = os.getenv('PAGE_RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aleph_render_cache'))
+PAGE_RENDER_CACHE_MAX_FILES = int(os.getenv('PAGE_RENDER_CACHE_MAX_FILES', 50))
+PAGE_RENDER_CACHE_MAX_BYTES = int(os.getenv('PAGE_RENDER_CACHE_MAX_BYTES', 5 * 1024 ** 3))
+# Prefix of downloads in progress in PAGE_RENDER_CACHE_DIR, never evicted
+PAGE_RENDER_DOWNLOAD_PREFIX = '.download-'
+
+# Postgres advisory lock key held by search_index_flush_paused()
+SEARCH_INDEX_PAUSE_LOCK = 0x5EA4C8
+
+
+def _local_copy(temp_file_path, bucket_name, unique_key, s3_service):
+    """
+    Return a path to the uploaded file on this worker and whether it is a
+    downloaded copy the caller has to remove. Pipeline stages may run on a
+    different machine than the one the upload landed on.
+    """
+    if os.path.exists(temp_file_path):
+        return temp_file_path, False
+    fd, local_path = tempfile.mkstemp(suffix=os.path.splitext(temp_file_path)[1])
+    os.close(fd)
+    s3_service.download_from_s3(unique_key, bucket_name, local_path)
+    return local_path, True
+
+
+@shared_task(bind=True)
+def process_document(self, project_id, file_name, temp_file_path, bucket_name, unique_key, upload_info=None):
+    """
+    Upload the original to S3 and fan the rest of the ingest out as a chord:
+    text extraction and chunks of page rendering run in parallel, then
+    finalize_document commits the database rows.
+    """
     try:
-        project = Project.objects.get(id=project_id)
+        Project.objects.get(id=project_id)
     except Project.DoesNotExist:
         return {'error': 'Project does not exist'}
 
-    s3_service = S3Service(
-        region_name=os.getenv('REGION'),
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+    s3_service = get_s3_service()
+
+    # Upload to S3 using the unique key name, the other stages read it from there
+    if not s3_service.upload_to_s3(temp_file_path, bucket_name, unique_key):
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        return {'error': f'Failed to upload {file_name} to S3'}
+
+    # File metadata is gathered at upload time when the view provides it
+    metadata = upload_info['metadata'] if upload_info else get_file_metadata(temp_file_path)
+    content_digest = upload_info['content_digest'] if upload_info else calculate_content_digest(temp_file_path)
+    page_count = metadata.get('Page Count') or count_pdf_pages(temp_file_path) or 0
+
+    # Large PDFs that have not been extracted before are split into page
+    # ranges, extracted by separate tasks and merged by finalize_document
+    page_ranges = []
+    if 'pdf' in (metadata.get('Type') or '') and not OCRResultCache.objects.filter(
+            content_digest=content_digest, engine_version=get_engine_version()).exists():
+        page_ranges = split_page_ranges(page_count)
+    if len(page_ranges) > 1:
+        header = [
+            extract_document_page_range.s(temp_file_path, bucket_name, unique_key, content_digest, start, end)
+            for start, end in page_ranges
+        ]
+    else:
+        header = [extract_document_text.s(temp_file_path, bucket_name, unique_key, content_digest)]
+    text_tasks = len(header)
+    if PAGE_RENDER_MODE != 'lazy':
+        header += [
+            render_document_pages.s(temp_file_path, bucket_name, unique_key, start, min(start + PAGE_RENDER_CHUNK_SIZE, page_count))
+            for start in range(0, page_count, PAGE_RENDER_CHUNK_SIZE)
+        ]
+    finalize = finalize_document.s(project_id, file_name, temp_file_path, bucket_name, unique_key, metadata,
+                                   page_count, text_tasks)
+    finalize.link_error(ingest_failed.s(project_id, file_name, temp_file_path, bucket_name, unique_key,
+                                        content_digest, page_count))
+    workflow = chord(header, finalize)
+
+    # Called in-process (outside production) the whole pipeline runs eagerly
+    if self.request.called_directly:
+        return workflow.apply().get()
+    result = workflow.apply_async()
+    return {'pipeline_id': result.id, 'text_tasks': text_tasks, 'render_tasks': len(header) - text_tasks}
+
+def _ocr_totals(ocr_stats):
+    # Per-page decisions grow with the document, only the totals are returned
+    if not ocr_stats:
+        return ocr_stats
+    return {key: value for key, value in ocr_stats.items() if key != 'decisions'}
+
+@shared_task
+def extract_document_text(temp_file_path, bucket_name, unique_key, content_digest):
+    """
+    Extract text and entities from the document, reusing the extraction result
+    of an identical file if we have one.
+
+    The result is kept in OCRResultCache, from where finalize_document reads
+    it; only its key and a summary travel through the result backend.
+    """
+    engine_version = get_engine_version()
+    extraction = {'content_digest': content_digest, 'engine_version': engine_version, 'error': None, 'ocr': None}
+    if OCRResultCache.lookup(content_digest, engine_version):
+        return {**extraction, 'ocr_cache': 'hit'}
+
+    try:
+        local_path, downloaded = _local_copy(temp_file_path, bucket_name, unique_key, get_s3_service())
+        try:
+            result, emails = ocr_document(local_path)
+        finally:
+            if downloaded:
+                os.remove(local_path)
+    except Exception as e:
+        print(f"Error extracting text from {unique_key}: {e}")
+        return {**extraction, 'error': str(e), 'ocr_cache': 'miss'}
+    if result.get('error'):
+        return {**extraction, 'error': result['error'], 'ocr_cache': 'miss'}
+
+    OCRResultCache.store(content_digest, engine_version, result['text'], emails, result.get('page_count'),
+                         result.get('pages'), result.get('entities'), result.get('ocr_stats'))
+    return {**extraction, 'ocr': _ocr_totals(result.get('ocr_stats')), 'ocr_cache': 'miss'}
+
+@shared_task
+def extract_document_page_range(temp_file_path, bucket_name, unique_key, content_digest, start_page, end_page):
+    """
+    Extract pages [start_page, end_page) of a large PDF, one of the tasks its
+    text extraction is split into. The pages are kept in OCRPageResult until
+    finalize_document merges them.
+    """
+    engine_version = get_engine_version()
+    extraction = {'content_digest': content_digest, 'engine_version': engine_version, 'error': None}
+    local_path, downloaded = None, False
+    try:
+        local_path, downloaded = _local_copy(temp_file_path, bucket_name, unique_key, get_s3_service())
+        pages = extract_pdf_page_range(local_path, start_page, end_page)
+    except Exception as e:
+        print(f"Error extracting text from {unique_key} pages {start_page + 1}-{end_page}: {e}")
+        return {**extraction, 'error': f"Error extracting text from file: {str(e)}"}
+    finally:
+        if downloaded:
+            os.remove(local_path)
+
+    OCRPageResult.objects.bulk_create(
+        [OCRPageResult(content_digest=content_digest, engine_version=engine_version, page_number=page['ocr']['page'],
+                       text="\n".join(page['fragments']), ocr=page['ocr']) for page in pages],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['content_digest', 'engine_version', 'page_number'],
+        update_fields=['text', 'ocr']
     )
+    return extraction
 
-    # Extract text and emails from the document
-    result, emails = ocr_document(temp_file_path)
-    # if result['error']:
-    #     return {'error': result['error']}
+def _merge_page_ranges(range_results, page_count):
+    """
+    Merge the pages extract_document_page_range stored for a document into
+    OCRResultCache and return the extraction summary extract_document_text
+    would have returned. When pages are missing (e.g. a range ran under
+    another engine version) nothing is stored, and finalize_document extracts
+    the document again.
+    """
+    content_digest, engine_version = range_results[0]['content_digest'], range_results[0]['engine_version']
+    extraction = {'content_digest': content_digest, 'engine_version': engine_version, 'error': None,
+                  'ocr': None, 'ocr_cache': 'miss'}
+    errors = [result['error'] for result in range_results if result['error']]
+    staged = OCRPageResult.objects.filter(content_digest=content_digest, engine_version=engine_version)
+    if errors:
+        staged.delete()
+        return {**extraction, 'error': errors[0]}
 
-    # Calculate the checksum of the file
-    metadata = get_file_metadata(temp_file_path)
+    pages = [{'fragments': [row.text], 'ocr': row.ocr} for row in staged.filter(page_number__lte=page_count)]
+    if len(pages) == page_count:
+        result = build_pdf_result(pages)
+        result['entities'] = extract_entities(result['pages'])
+        OCRResultCache.store(content_digest, engine_version, result['text'], result['entities']['email'],
+                             result['page_count'], result['pages'], result['entities'], result['ocr_stats'])
+        extraction['ocr'] = _ocr_totals(result['ocr_stats'])
+    staged.delete()
+    return extraction
+
+@shared_task
+def render_document_pages(temp_file_path, bucket_name, unique_key, start_page, end_page):
+    """
+    Render pages [start_page, end_page) of the document and upload them to S3
+    as one concurrent batch.
+    """
+    uploads = []
+    page_keys = {}
+    s3_service = get_s3_service()
+    local_path, downloaded = None, False
+    try:
+        local_path, downloaded = _local_copy(temp_file_path, bucket_name, unique_key, s3_service)
+        pdf_document = fitz.open(local_path)
+        for page_number in range(start_page, end_page):
+            page = pdf_document.load_page(page_number)
+            image_bytes, extension, content_type = render_page_image(page)
+            s3_image_key = f"{unique_key}_page_{page_number + 1}.{extension}"
+            uploads.append((s3_image_key, image_bytes, content_type))
+            page_keys[page_number + 1] = s3_image_key
+        pdf_document.close()
+    except Exception as e:
+        print(f"Error processing PDF pages: {e}")
+        error = str(e)
+    else:
+        error = None
+    finally:
+        if downloaded:
+            os.remove(local_path)
+
+    pages = []
+    results = s3_service.upload_batch_to_s3(uploads, bucket_name)
+    for page_number, s3_image_key in page_keys.items():
+        if results[s3_image_key]['success']:
+            image_url = s3_service.get_document_url(s3_file=s3_image_key, s3_bucket=bucket_name)
+            pages.append({'page_number': page_number, 'image_url': image_url})
+        else:
+            error = results[s3_image_key]['error']
+    return {'pages': pages, 'error': error}
+
+@shared_task
+def finalize_document(stage_results, project_id, file_name, temp_file_path, bucket_name, unique_key, metadata,
+                      page_count=None, text_tasks=1):
+    """
+    Commit the Document, DocumentMeta, OCRText and PageImage rows in one
+    transaction once text extraction and all page rendering chunks have
+    finished. The first text_tasks results come from text extraction, which
+    is merged here when it was split into page ranges. Search indexing runs
+    after the commit (see users/signals.py).
+    """
+    extractions, render_chunks = stage_results[:text_tasks], stage_results[text_tasks:]
+    extraction = extractions[0] if text_tasks == 1 else _merge_page_ranges(extractions, page_count)
+    status = {
+        'error': extraction['error'],
+        'ocr_cache': extraction['ocr_cache'],
+        # Keep the OCR totals with the task result so the time saved by
+        # skipping pages with a text layer can be inspected.
+        'ocr': extraction['ocr'],
+    }
 
-    # Upload to S3 using the unique key name
-    if s3_service.upload_to_s3(temp_file_path, bucket_name, unique_key):
+    ocr_result = None
+    if not extraction['error']:
+        ocr_result = OCRResultCache.lookup(extraction['content_digest'], extraction['engine_version'])
+        if ocr_result is None:
+            # Evicted since extraction, run it again
+            status['error'] = extract_document_text(temp_file_path, bucket_name, unique_key,
+                                                    extraction['content_digest'])['error']
+            ocr_result = OCRResultCache.lookup(extraction['content_digest'], extraction['engine_version'])
+    emails = ocr_result.emails if ocr_result else []
+
+    project = Project.objects.get(id=project_id)
+    s3_service = get_s3_service()
+    document_url = s3_service.get_document_url(s3_file=unique_key, s3_bucket=bucket_name)
+
+    pages = []
+    for chunk in render_chunks:
+        if chunk['error']:
+            status['error'] = chunk['error']
+        pages.extend(chunk['pages'])
+
+    with transaction.atomic():
         # Save document information
-        document_url = s3_service.get_document_url(s3_file=unique_key, s3_bucket=bucket_name)
         doc = Document.objects.create(file_url=document_url,
                                       s3_file_name=unique_key,
                                       project=project,
-                                      file_name=file_name)
+                                      file_name=file_name,
+                                      page_count=page_count)
 
         # Save document metadata
         DocumentMeta.objects.create(
@@ -52,33 +297,226 @@ def process_document(project_id, file_name, temp_file_path, bucket_name, unique_
             last_accessed_time=metadata['Last Accessed Time']
         )
 
-        # Save OCR text and emails
+        # Save OCR text and emails, each address once in order of appearance
         OCRText.objects.create(
             document=doc,
-            text = result['text'] if not result.get('error') else 'OCR NOT SUPPORTED',
-            emails=emails
+            text = ocr_result.text if ocr_result else 'OCR NOT SUPPORTED',
+            emails=list(dict.fromkeys(emails)),
+            entities=ocr_result.entities if ocr_result else {},
+            ocr_stats=ocr_result.ocr_stats if ocr_result else {}
+        )
+        DocumentEmail.index_document(doc, emails)
+
+        # Save the text of each page for paged retrieval
+        OCRPageText.objects.bulk_create(
+            [OCRPageText(document=doc, page_number=number, text=text)
+             for number, text in enumerate(ocr_result.pages if ocr_result else [], start=1)],
+            batch_size=500
         )
+
+        # Save all page images in one statement per batch
+        PageImage.objects.bulk_create(
+            [PageImage(document=doc, page_number=page['page_number'], image_url=page['image_url']) for page in pages],
+            batch_size=500
+        )
+
+    if os.path.exists(temp_file_path):
+        os.remove(temp_file_path)
+
+    return {'document_id': doc.id, 'status':status}
+
+@shared_task
+def ingest_failed(request, exc, traceback, project_id, file_name, temp_file_path, bucket_name, unique_key,
+                  content_digest, page_count=None):
+    """
+    Error callback of the ingest chord, called when a stage or finalize_document
+    raised. The failure is reported and, unless the Document was committed,
+    the upload is removed from disk and S3 together with its page images and
+    any page ranges staged for it.
+    """
+    print(f"Ingest of {file_name} into project {project_id} failed in task {request.id}: {exc!r}")
+    if os.path.exists(temp_file_path):
+        os.remove(temp_file_path)
+    OCRPageResult.objects.filter(content_digest=content_digest).delete()
+    if Document.objects.filter(s3_file_name=unique_key).exists():
+        return
+
+    extension = IMAGE_FORMATS[PAGE_IMAGE_FORMAT.lower().replace('jpg', 'jpeg')][0]
+    keys = [unique_key] + [f"{unique_key}_page_{page_number}.{extension}" for page_number in range(1, (page_count or 0) + 1)]
+    s3_service = get_s3_service()
+    try:
+        # delete_objects takes at most 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            s3_service.bulk_delete_files(keys[start:start + 1000], bucket_name)
+    except Exception as e:
+        print(f"Failed to remove {unique_key} from S3 after the failed ingest: {e}")
+
+
+def _cached_original(document, bucket_name, s3_service):
+    """
+    Local copy of a document's original for on-demand rendering, downloaded
+    once and kept in PAGE_RENDER_CACHE_DIR. The oldest files are evicted until
+    the cache is within both PAGE_RENDER_CACHE_MAX_FILES and
+    PAGE_RENDER_CACHE_MAX_BYTES; the file just requested is always kept.
+    """
+    os.makedirs(PAGE_RENDER_CACHE_DIR, exist_ok=True)
+    local_path = os.path.join(PAGE_RENDER_CACHE_DIR, document.s3_file_name)
+    if os.path.exists(local_path):
+        os.utime(local_path)
+        return local_path
+
+    fd, download_path = tempfile.mkstemp(dir=PAGE_RENDER_CACHE_DIR, prefix=PAGE_RENDER_DOWNLOAD_PREFIX)
+    os.close(fd)
+    try:
+        s3_service.download_from_s3(document.s3_file_name, bucket_name, download_path)
+        os.replace(download_path, local_path)
+    finally:
+        if os.path.exists(download_path):
+            os.remove(download_path)
+
+    cached_files = []
+    for entry in os.scandir(PAGE_RENDER_CACHE_DIR):
+        # Other requests' downloads in progress are left alone
+        if entry.name.startswith(PAGE_RENDER_DOWNLOAD_PREFIX):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue  # evicted by another request meanwhile
+        cached_files.append((stat.st_mtime, stat.st_size, entry.path))
+    cached_files.sort()
+    file_count = len(cached_files)
+    total_bytes = sum(size for _, size, _ in cached_files)
+    for _, size, stale_path in cached_files:
+        if file_count <= PAGE_RENDER_CACHE_MAX_FILES and total_bytes <= PAGE_RENDER_CACHE_MAX_BYTES:
+            break
+        if stale_path == local_path:
+            continue
         try:
-            pdf_document = fitz.open(temp_file_path)
-            for page_number in range(len(pdf_document)):
-                page = pdf_document.load_page(page_number)
-                pixmap = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                image_bytes = pixmap.tobytes()
-                s3_image_key = f"{unique_key}_page_{page_number + 1}.jpg"
-                if s3_service.upload_image_to_s3(image_bytes, bucket_name, s3_image_key):
-                    image_url = s3_service.get_document_url(s3_file=s3_image_key, s3_bucket=bucket_name)
-                    PageImage.objects.create(document=doc, page_number=page_number + 1, image_url=image_url)
-                pixmap = None  # Clean up the pixmap object
-            pdf_document.close()
-        except Exception as e:
-            status['error'] = str(e)
-            print(f"Error processing PDF pages: {e}")
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+        file_count -= 1
+        total_bytes -= size
+    return local_path
 
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+def render_page_on_demand(document, page_number, bucket_name):
+    """
+    Return the PageImage for a page, rendering and uploading it first if it
+    has not been rendered yet.
+    """
+    page_image = PageImage.objects.filter(document=document, page_number=page_number).first()
+    if page_image and page_image.image_url:
+        return page_image
 
-        return {'document_id': doc.id, 'status':status}
-    else:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-        return {'error': f'Failed to upload {file_name} to S3'}
+    s3_service = get_s3_service()
+    pdf_document = fitz.open(_cached_original(document, bucket_name, s3_service))
+    try:
+        page = pdf_document.load_page(page_number - 1)
+        image_bytes, extension, content_type = render_page_image(page)
+    finally:
+        pdf_document.close()
+
+    s3_image_key = f"{document.s3_file_name}_page_{page_number}.{extension}"
+    s3_service.upload_image_to_s3(image_bytes, bucket_name, s3_image_key, content_type)
+    image_url = s3_service.get_document_url(s3_file=s3_image_key, s3_bucket=bucket_name)
+    # With the unique (document, page_number) a concurrent render of the
+    # same page updates the row created by the other request
+    page_image, _ = PageImage.objects.update_or_create(
+        document=document, page_number=page_number, defaults={'image_url': image_url}
+    )
+    return page_image
+
+
+def _index_queued(entries):
+    """
+    Send a batch of SearchIndexQueue entries to Elasticsearch through the bulk
+    API. Raises when Elasticsearch rejects any of them.
+    """
+    groups = {}
+    for entry in entries:
+        groups.setdefault((entry.app_label, entry.model_name, entry.action), []).append(entry.object_id)
+
+    for (app_label, model_name, action), object_ids in groups.items():
+        model = apps.get_model(app_label, model_name)
+        for doc_class in registry.get_documents([model]):
+            doc = doc_class()
+            if action == 'index':
+                doc.update(doc.get_queryset().filter(pk__in=object_ids))
+                continue
+            actions = [
+                {'_op_type': 'delete', '_index': doc._index._name, '_id': object_id}
+                for object_id in object_ids
+            ]
+            _, errors = bulk(connections.get_connection(), actions, raise_on_error=False)
+            # Deleting a document that was never indexed is fine
+            errors = [error for error in errors if error.get('delete', {}).get('status') != 404]
+            if errors:
+                raise RuntimeError(f"Failed to delete {len(errors)} documents from {doc._index._name}: {errors[:5]}")
+
+@contextmanager
+def search_index_flush_paused():
+    """
+    Keep drain_search_index_queue, in every process, from sending anything to
+    Elasticsearch while the block runs; changes wait in SearchIndexQueue.
+    Used by reindex_search while it builds a new index.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [SEARCH_INDEX_PAUSE_LOCK])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [SEARCH_INDEX_PAUSE_LOCK])
+
+def _claim_queued():
+    """
+    Take up to SEARCH_INDEX_BATCH_SIZE entries off the queue, or None while
+    flushing is paused. The rows are deleted in a short transaction, so saves
+    that enqueue the same objects never wait on Elasticsearch; they simply
+    queue them again.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock_shared(%s)", [SEARCH_INDEX_PAUSE_LOCK])
+            if not cursor.fetchone()[0]:
+                return None
+        entries = list(
+            SearchIndexQueue.objects.select_for_update(skip_locked=True)
+            .order_by('created_at')[:settings.SEARCH_INDEX_BATCH_SIZE]
+        )
+        SearchIndexQueue.objects.filter(id__in=[entry.id for entry in entries]).delete()
+    return entries
+
+def drain_search_index_queue():
+    """
+    Send SearchIndexQueue to Elasticsearch batch by batch. A batch that fails
+    is put back on the queue, except for objects that were queued again in
+    the meantime, and the error is raised. While flushing is paused nothing
+    is sent; reindex_search drains the queue itself afterwards.
+    """
+    flushed = 0
+    while True:
+        entries = _claim_queued()
+        if entries is None:
+            return {'flushed': flushed, 'paused': True}
+        if not entries:
+            return {'flushed': flushed}
+        try:
+            _index_queued(entries)
+        except Exception:
+            SearchIndexQueue.objects.bulk_create(
+                [SearchIndexQueue(app_label=entry.app_label, model_name=entry.model_name,
+                                  object_id=entry.object_id, action=entry.action) for entry in entries],
+                ignore_conflicts=True
+            )
+            raise
+        flushed += len(entries)
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=300, max_retries=10)
+def flush_search_index():
+    """
+    Drain SearchIndexQueue into Elasticsearch, retrying with backoff while
+    Elasticsearch rejects batches.
+    """
+    return drain_search_index_queue()
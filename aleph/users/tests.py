@@ -1,3 +1,510 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import statistics
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from helpers.entities import extract_entities
+from users import streaming, tasks, urls, user_ids
+from users.models import *
+
+# Data set sizes compared by the query count tests
+SMALL_N = 2
+LARGE_N = 6
+
+# Per-endpoint latency at LARGE_N. Regenerate on the reference machine with
+#   UPDATE_LATENCY_BASELINE=1 pytest aleph/users/tests.py
+LATENCY_BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'endpoint_latency.json')
+LATENCY_TOLERANCE = float(os.getenv('LATENCY_TOLERANCE', 2.0))
+LATENCY_SLACK = float(os.getenv('LATENCY_SLACK', 0.05))  # seconds, absorbs timer noise on fast endpoints
+LATENCY_RUNS = 5  # the median of these runs is compared
+
+
+def seed(n):
+    """
+    Create n users, n potential users and n projects, each project holding n
+    documents of n pages with their meta, OCR text, page texts, page images
+    and email index. Rows are bulk created, so no search indexing is queued.
+    """
+    User.objects.bulk_create([
+        User(user_id=f'T{n}{i:04d}', email=f'user{i}@example.com', first_name='Test', last_name=f'User {i}',
+             group='review', status='active')
+        for i in range(n)
+    ])
+    PotentialUser.objects.bulk_create([
+        PotentialUser(email=f'applicant{i}@example.com', first_name='Test', last_name=f'Applicant {i}')
+        for i in range(n)
+    ])
+    projects = Project.objects.bulk_create([
+        Project(name=f'Project {i}', description='Seeded project') for i in range(n)
+    ])
+    documents = Document.objects.bulk_create([
+        Document(project=project, file_name=f'document_{project.id}_{i}.pdf', s3_file_name=f'key_{project.id}_{i}',
+                 file_url=f'https://example.com/key_{project.id}_{i}', page_count=n)
+        for project in projects for i in range(n)
+    ])
+    DocumentMeta.objects.bulk_create([
+        DocumentMeta(document=document, hash_value=document.s3_file_name, name=document.file_name,
+                     size_bytes=1024, file_type='application/pdf', is_directory=False, permissions='644')
+        for document in documents
+    ])
+    OCRText.objects.bulk_create([
+        OCRText(document=document, text=f'Invoice for {document.file_name} sent to owner{document.id}@example.com',
+                emails=[f'owner{document.id}@example.com'])
+        for document in documents
+    ])
+    OCRText.objects.update(search_vector=SearchVector('text', config=settings.POSTGRES_SEARCH_CONFIG))
+    DocumentEmail.objects.bulk_create([
+        DocumentEmail(document=document, email=f'owner{document.id}@example.com') for document in documents
+    ])
+    OCRPageText.objects.bulk_create([
+        OCRPageText(document=document, page_number=page, text=f'Invoice page {page}')
+        for document in documents for page in range(1, n + 1)
+    ])
+    PageImage.objects.bulk_create([
+        PageImage(document=document, page_number=page, image_url=f'https://example.com/{document.s3_file_name}_{page}.png')
+        for document in documents for page in range(1, n + 1)
+    ])
+
+    # Rows the mutating endpoints remove. They have a fixed size, because a
+    # cascading delete queues one search index entry per indexed row.
+    disposable_project = Project.objects.create(name='Disposable', description='Deleted by the tests')
+    disposable_document = Document.objects.create(
+        project=disposable_project, file_name='disposable.pdf', s3_file_name='disposable', page_count=1
+    )
+    disposable_user, = User.objects.bulk_create([
+        User(user_id=f'D{n}', email='disposable@example.com', first_name='Disposable', last_name='User',
+             group='review', status='active')
+    ])
+    return {
+        'project': projects[0],
+        'document': documents[0],
+        'disposable_project': disposable_project,
+        'disposable_document': disposable_document,
+        'disposable_user': disposable_user,
+    }
+
+
+# url name -> (method, kwargs(fixture), data(fixture), format)
+ENDPOINTS = {
+    'api-login': ('post', None, lambda f: {'email': 'admin@example.com', 'password': 'secret'}, 'json'),
+    'user-create': ('post', None, lambda f: {'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+                                             'group': 'review', 'status': 'active', 'password': 'secret'}, 'json'),
+    'user-update': ('put', None, lambda f: {'email': 'user0@example.com', 'first_name': 'Renamed', 'last_name': 'User'}, 'json'),
+    'user-delete': ('delete', None, lambda f: {'email': f['disposable_user'].email}, 'json'),
+    'user-details': ('get', lambda f: {'email': 'user0@example.com'}, None, None),
+    'all-user-details': ('get', None, None, None),
+    'api-upload-document': ('post', None, lambda f: {
+        'project_id': f['project'].id,
+        'files': [SimpleUploadedFile('query_count_upload.txt', b'Invoice sent to billing@example.com', 'text/plain')],
+    }, 'multipart'),
+    'api-create-project': ('post', None, lambda f: {'name': 'New project', 'description': 'Created by the tests'}, 'json'),
+    'api-project-details': ('get', None, None, None),
+    'api-project-documents': ('get', lambda f: {'project_id': f['project'].id}, None, None),
+    'ocr-text-documents': ('get', lambda f: {'document_id': f['document'].id}, None, None),
+    'ocr-text-pages': ('get', lambda f: {'document_id': f['document'].id}, None, None),
+    'document_image_urls_list': ('get', lambda f: {'document_id': f['document'].id}, None, None),
+    'document_page_image': ('get', lambda f: {'document_id': f['document'].id, 'page_number': 1}, None, None),
+    'api-project-delete': ('delete', None, lambda f: {'project_id': f['disposable_project'].id}, 'json'),
+    'api-download-document': ('get', lambda f: {'document_id': f['document'].id}, None, None),
+    'remove_s3_file': ('delete', None, lambda f: {'document_id': f['disposable_document'].id}, 'json'),
+    'potential-user-signup': ('post', None, lambda f: {'email': 'applicant@example.com', 'first_name': 'New',
+                                                       'last_name': 'Applicant'}, 'json'),
+    'approve-user': ('post', None, lambda f: {'email': 'applicant0@example.com', 'is_approved': True}, 'json'),
+    'all-potential-user-details': ('get', None, None, None),
+    'company-create': ('post', None, lambda f: {'name': 'Company', 'address': 'Street 1', 'contact': '123',
+                                                'email': 'user0@example.com'}, 'json'),
+    'search-ocrtext': ('get', None, lambda f: {'q': 'invoice', 'backend': 'postgres'}, None),
+    'email-lookup': ('post', None, lambda f: {'emails': [f"owner{f['document'].id}@example.com", 'nobody@example.com']}, 'json'),
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], POSTGRES_SEARCH_VECTORS=True)
+class EndpointQueryCountTests(TestCase):
+    """
+    Hits every route in users/urls.py against data sets of SMALL_N and LARGE_N
+    and fails when the number of queries an endpoint runs grows with the data,
+    i.e. on an N+1. S3, Elasticsearch indexing and Celery are stubbed out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', password='secret', first_name='Admin',
+                                             last_name='User', group='admin', status='active')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        s3_service = mock.MagicMock()
+        s3_service.delete_file.return_value = True
+        s3_service.bulk_delete_files.return_value = {'Deleted': []}
+        s3_service.get_document_url.return_value = 'https://example.com/stub'
+        for target, value in [
+            ('users.views.get_s3_service', mock.MagicMock(return_value=s3_service)),
+            ('users.tasks.get_s3_service', mock.MagicMock(return_value=s3_service)),
+            ('users.views.process_document', mock.MagicMock(return_value={'pipeline_id': 'stub', 'render_tasks': 0})),
+            ('users.signals.QueuedSignalProcessor._schedule_flush', mock.MagicMock()),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if os.path.exists('/tmp/query_count_upload.txt'):
+            os.remove('/tmp/query_count_upload.txt')
+
+    def measure(self, name, n):
+        """
+        Seed n, call the endpoint and roll the data back. Returns the response,
+        the captured queries and the elapsed seconds.
+        """
+        method, kwargs, data, data_format = ENDPOINTS[name]
+        with transaction.atomic():
+            fixture = seed(n)
+            url = reverse(name, kwargs=kwargs(fixture) if kwargs else None)
+            request_kwargs = {'format': data_format} if data_format else {}
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data(fixture) if data else None, **request_kwargs)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return response, queries, elapsed
+
+    def test_every_route_is_covered(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names - set(ENDPOINTS), set(), 'Add the new routes to ENDPOINTS')
+
+    def test_query_count_does_not_grow(self):
+        for name in ENDPOINTS:
+            with self.subTest(endpoint=name):
+                small_response, small, _ = self.measure(name, SMALL_N)
+                large_response, large, _ = self.measure(name, LARGE_N)
+                self.assertLess(small_response.status_code, 300, small_response.content[:500])
+                self.assertLess(large_response.status_code, 300, large_response.content[:500])
+                self.assertEqual(
+                    len(small), len(large),
+                    f'{name} ran {len(small)} queries for n={SMALL_N} and {len(large)} for n={LARGE_N}:\n'
+                    + '\n'.join(query['sql'] for query in large.captured_queries)
+                )
+
+    def test_latency_against_baseline(self):
+        for name in ENDPOINTS:
+            self.measure(name, SMALL_N)  # warm up imports, URL resolving and connections
+        timings = {
+            name: statistics.median(self.measure(name, LARGE_N)[2] for _ in range(LATENCY_RUNS))
+            for name in ENDPOINTS
+        }
+
+        if os.getenv('UPDATE_LATENCY_BASELINE'):
+            os.makedirs(os.path.dirname(LATENCY_BASELINE_PATH), exist_ok=True)
+            with open(LATENCY_BASELINE_PATH, 'w') as baseline_file:
+                json.dump({name: round(elapsed, 4) for name, elapsed in sorted(timings.items())}, baseline_file, indent=2)
+            return
+        if not os.path.exists(LATENCY_BASELINE_PATH):
+            self.skipTest(f'No latency baseline at {LATENCY_BASELINE_PATH}')
+
+        with open(LATENCY_BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+        for name, elapsed in timings.items():
+            if name not in baseline:
+                continue
+            with self.subTest(endpoint=name):
+                limit = baseline[name] * LATENCY_TOLERANCE + LATENCY_SLACK
+                self.assertLessEqual(elapsed, limit, f'{name} took {elapsed:.3f}s, baseline {baseline[name]:.3f}s')
+
+
+class SearchBackendTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='admin@example.com', password='secret', first_name='Admin', last_name='User', group='admin',
+            status='active'))
+
+    @override_settings(POSTGRES_SEARCH_VECTORS=False)
+    def test_postgres_backend_rejected_without_search_vectors(self):
+        response = self.client.get(reverse('search-ocrtext'), {'q': 'invoice', 'backend': 'postgres'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('POSTGRES_SEARCH_VECTORS', response.data['error'])
+
+    @override_settings(POSTGRES_SEARCH_VECTORS=True)
+    def test_postgres_backend_with_search_vectors(self):
+        response = self.client.get(reverse('search-ocrtext'), {'q': 'invoice', 'backend': 'postgres'})
+        self.assertEqual(response.status_code, 200)
+
+
+class OCRPageTextTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='admin@example.com', password='secret', first_name='Admin', last_name='User', group='admin',
+            status='active'))
+        project = Project.objects.create(name='Project', description='Pages')
+        self.document = Document.objects.create(project=project, file_name='legacy.pdf', s3_file_name='legacy')
+
+    def test_document_without_page_texts_is_served_as_one_page(self):
+        OCRText.objects.create(document=self.document, text='Full text from before page texts')
+        url = reverse('ocr-text-pages', kwargs={'document_id': self.document.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['page_count'], 1)
+        self.assertEqual(response.data['pages'], [{'page_number': 1, 'text': 'Full text from before page texts'}])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.client.get(url, {'start': 2}).data['pages'], [])
+
+    def test_document_without_text(self):
+        response = self.client.get(reverse('ocr-text-pages', kwargs={'document_id': self.document.id}))
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_render_error_is_not_returned(self):
+        url = reverse('document_page_image', kwargs={'document_id': self.document.id, 'page_number': 1})
+        error = OSError("No such file: '/tmp/aleph_render_cache/legacy' in bucket aleph-s3-bucket")
+        with mock.patch('users.views.render_page_on_demand', side_effect=error), \
+                mock.patch('builtins.print'), mock.patch('traceback.print_exc'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data, {'error': 'Page image could not be rendered'})
+
+
+class PageRenderCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        patcher = mock.patch.object(tasks, 'PAGE_RENDER_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.s3_service = mock.MagicMock()
+        self.s3_service.download_from_s3.side_effect = self.download
+
+    def download(self, key, bucket_name, path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * int(key.split('-')[1]))
+
+    def cache(self, key, mtime):
+        path = tasks._cached_original(Document(s3_file_name=key), 'bucket', self.s3_service)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_evicts_oldest_beyond_byte_limit(self):
+        with mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_FILES', 10), \
+                mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_BYTES', 200):
+            for mtime, key in enumerate(['a-100', 'b-100', 'c-100', 'd-50']):
+                self.cache(key, mtime)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['c-100', 'd-50'])
+
+    def test_evicts_oldest_beyond_file_limit(self):
+        with mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_FILES', 2), \
+                mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_BYTES', 10000):
+            for mtime, key in enumerate(['a-1', 'b-1', 'c-1']):
+                self.cache(key, mtime)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['b-1', 'c-1'])
+
+    def test_keeps_requested_file_larger_than_limit(self):
+        with mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_FILES', 10), \
+                mock.patch.object(tasks, 'PAGE_RENDER_CACHE_MAX_BYTES', 100):
+            self.cache('a-50', 0)
+            path = tasks._cached_original(Document(s3_file_name='b-500'), 'bucket', self.s3_service)
+        self.assertEqual(os.listdir(self.cache_dir), ['b-500'])
+        self.assertEqual(os.path.getsize(path), 500)
+
+
+# (entity type, text, expected values); includes known false positives
+ENTITY_CASES = [
+    ('email', 'Write to John.Doe@Example.COM or john.doe@example.com', ['john.doe@example.com']),
+    ('email', 'billing at example dot com', []),
+    ('url', 'See https://example.com/a?b=1). and www.example.org, then', ['https://example.com/a?b=1', 'www.example.org']),
+    ('iban', 'IBAN DE89 3704 0044 0532 0130 00', ['DE89370400440532013000']),
+    ('iban', 'GB82WEST12345698765432', ['GB82WEST12345698765432']),
+    ('date', 'Due 2024-01-15, 15.01.2024, 2024.01.15, 3 March 2024 or Mar 3, 2024',
+     ['2024-01-15', '15.01.2024', '2024.01.15', '3 March 2024', 'Mar 3, 2024']),
+    ('date', 'Version 1.2.3', []),
+    ('phone', 'Call +49 30 1234567, 030 1234 5678 or (212) 555-1234',
+     ['+49301234567', '03012345678', '2125551234']),
+    ('phone', 'Invoice 20240115001', []),
+    ('phone', 'order 2024 1234 5678', []),
+    ('phone', 'Reference INV-2024-00012345', []),
+    ('phone', 'Total 1.234.567,89 EUR', []),
+    ('phone', 'Dated 15.01.2024 and 2024.01.15', []),
+    ('phone', 'IBAN DE89 3704 0044 0532 0130 00', []),
+]
+
+
+class EntityExtractionTests(SimpleTestCase):
+
+    def test_entities(self):
+        for entity_type, text, expected in ENTITY_CASES:
+            with self.subTest(entity_type=entity_type, text=text):
+                self.assertEqual(extract_entities([text])[entity_type], expected)
+
+    def test_values_are_deduplicated_across_pages(self):
+        entities = extract_entities(['Mail a@example.com', None, 'Mail A@example.com and b@example.com'])
+        self.assertEqual(entities['email'], ['a@example.com', 'b@example.com'])
+
+
+# Multi-byte characters on both sides of page boundaries
+STREAM_PAGES = ['Seite eins: Grüße', '€ page two ✓', 'ß', 'Final page ending in é']
+STREAM_TEXT = '\n'.join(STREAM_PAGES)
+
+
+class OCRTextStreamingTests(TestCase):
+    """
+    Streamed bytes must be exactly text.encode()[start:end + 1], whether the
+    text is read from the page rows or from the single OCRText row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='admin@example.com', password='secret', first_name='Admin',
+                                            last_name='User', group='admin', status='active')
+        project = Project.objects.create(name='Project', description='Streaming')
+        cls.paged = Document.objects.create(project=project, file_name='paged.pdf', s3_file_name='paged')
+        OCRText.objects.create(document=cls.paged, text=STREAM_TEXT)
+        OCRPageText.objects.bulk_create([
+            OCRPageText(document=cls.paged, page_number=number, text=text)
+            for number, text in enumerate(STREAM_PAGES, start=1)
+        ])
+        cls.unpaged = Document.objects.create(project=project, file_name='unpaged.txt', s3_file_name='unpaged')
+        OCRText.objects.create(document=cls.unpaged, text=STREAM_TEXT)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Several chunks per response for the single row reader
+        patcher = mock.patch.object(streaming, 'OCR_STREAM_CHUNK_BYTES', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, document, **headers):
+        url = reverse('ocr-text-documents', kwargs={'document_id': document.id})
+        response = self.client.get(url, {'stream': '1'}, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_ranges(self):
+        data = STREAM_TEXT.encode()
+        size = len(data)
+        boundary = len(STREAM_PAGES[0].encode())  # offset of the first separator
+        ranges = {
+            'bytes=0-0': (0, 0),
+            f'bytes={boundary}-{boundary}': (boundary, boundary),
+            f'bytes={boundary - 2}-{boundary + 4}': (boundary - 2, boundary + 4),
+            'bytes=3-': (3, size - 1),
+            f'bytes=10-{size + 100}': (10, size - 1),
+            'bytes=-7': (size - 7, size - 1),
+            f'bytes=-{size + 100}': (0, size - 1),
+            f'bytes=1-{size - 2}': (1, size - 2),
+        }
+        for document in (self.paged, self.unpaged):
+            for header, (start, end) in ranges.items():
+                with self.subTest(document=document.file_name, range=header):
+                    response, content = self.fetch(document, HTTP_RANGE=header)
+                    self.assertEqual(response.status_code, 206)
+                    self.assertEqual(content, data[start:end + 1])
+                    self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                    self.assertEqual(response['Content-Length'], str(end - start + 1))
+
+    def test_every_single_byte(self):
+        data = STREAM_TEXT.encode()
+        for document in (self.paged, self.unpaged):
+            reader = streaming.OCRTextReader(document.id)
+            self.assertEqual(reader.size, len(data))
+            for offset in range(len(data)):
+                self.assertEqual(b''.join(reader.iter_bytes(offset, offset)), data[offset:offset + 1])
+
+    def test_unsatisfiable_ranges(self):
+        size = len(STREAM_TEXT.encode())
+        for header in (f'bytes={size}-', f'bytes={size + 5}-{size + 10}', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(range=header):
+                response, _ = self.fetch(self.paged, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_full_text_and_ignored_ranges(self):
+        for document in (self.paged, self.unpaged):
+            for headers in ({}, {'HTTP_RANGE': 'items=0-5'}, {'HTTP_RANGE': 'bytes=0-1,4-5'}, {'HTTP_RANGE': 'bytes=-'}):
+                with self.subTest(document=document.file_name, headers=headers):
+                    response, content = self.fetch(document, **headers)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(content, STREAM_TEXT.encode())
+                    self.assertEqual(response['Content-Length'], str(len(content)))
+
+    def test_gzip(self):
+        for document in (self.paged, self.unpaged):
+            with self.subTest(document=document.file_name):
+                response, content = self.fetch(document, HTTP_ACCEPT_ENCODING='gzip, deflate')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(content), STREAM_TEXT.encode())
+
+                # A range is served as identity bytes, the offsets refer to the uncompressed text
+                response, content = self.fetch(document, HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=2-20')
+                self.assertEqual(response.status_code, 206)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(content, STREAM_TEXT.encode()[2:21])
+
+
+@override_settings(USER_ID_PREFIX='U', USER_ID_ALPHABET='0123456789ABCDEFGHJKLMNPQRSTUVWXYZ', USER_ID_MIN_LENGTH=6,
+                   USER_ID_BLOCK_SIZE=3)
+class UserIdTests(TestCase):
+
+    def setUp(self):
+        # Numbers reserved by earlier tests belong to rolled back sequences
+        user_ids._block.clear()
+        self.addCleanup(user_ids._block.clear)
+
+    def test_round_trip(self):
+        for number in (0, 1, 33, 34, 34 ** 6 - 1, 34 ** 6, 10 ** 12, 34 ** 19 - 1):
+            with self.subTest(number=number):
+                user_id = user_ids.encode_user_id(number)
+                self.assertLessEqual(len(user_id), 20)
+                self.assertEqual(user_ids.decode_user_id(user_id), number)
+
+    def test_padding(self):
+        self.assertEqual(user_ids.encode_user_id(0), 'U000000')
+        self.assertEqual(user_ids.encode_user_id(1), 'U000001')
+        self.assertEqual(user_ids.encode_user_id(34), 'U000010')
+        self.assertEqual(user_ids.encode_user_id(34 ** 6), 'U1000000')
+
+    def test_too_long(self):
+        # Prefix and 20 digits do not fit User.user_id
+        with self.assertRaises(ValueError):
+            user_ids.encode_user_id(34 ** 19)
+
+    def test_legacy_ids(self):
+        for user_id in ('12A', '99Z', 'AB12345', 'U12345', 'U00000I', 'u000001', ''):
+            with self.subTest(user_id=user_id):
+                self.assertIsNone(user_ids.decode_user_id(user_id))
+
+    def test_unique_across_block_refills(self):
+        allocated = []
+        for count in (1, 2, 2, 7, 1, 3):
+            allocated += user_ids.allocate_user_ids(count)
+        # A forked process starts without its parent's block
+        user_ids._block.clear()
+        allocated += user_ids.allocate_user_ids(4)
+        allocated.append(User.objects.create_user(email='new@example.com', first_name='New', last_name='User',
+                                                  group='review', status='active').user_id)
+
+        numbers = [user_ids.decode_user_id(user_id) for user_id in allocated]
+        self.assertEqual(len(set(allocated)), len(allocated))
+        self.assertEqual(numbers, sorted(numbers))
+
+    def test_advance_sequence(self):
+        before = user_ids.decode_user_id(user_ids.allocate_user_id())
+        user_ids.advance_sequence(before + 1000)
+        self.assertGreater(user_ids.decode_user_id(user_ids.allocate_user_id()), before + 1000)
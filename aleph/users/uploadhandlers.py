@@ -0,0 +1,65 @@
+import hashlib
+
+from django.core.files.move import file_move_safe
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from helpers.checksum import SNIFF_BYTES, build_upload_info, write_file_chunks
+
+
+class UploadDigestMixin:
+    """
+    Hash, measure and keep the first bytes of an upload while Django receives
+    it, so the view does not have to read the file back afterwards.
+    """
+    def new_file(self, *args, **kwargs):
+        self.sha256_hash = hashlib.sha256()
+        self.upload_size = 0
+        self.upload_head = b""
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes large files on to the next handler
+        if getattr(self, 'activated', True):
+            self.sha256_hash.update(raw_data)
+            self.upload_size += len(raw_data)
+            if len(self.upload_head) < SNIFF_BYTES:
+                self.upload_head += raw_data[:SNIFF_BYTES - len(self.upload_head)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256_hash = self.sha256_hash
+            file.upload_size = self.upload_size
+            file.upload_head = self.upload_head
+        return file
+
+
+class DigestMemoryFileUploadHandler(UploadDigestMixin, MemoryFileUploadHandler):
+    pass
+
+
+class DigestTemporaryFileUploadHandler(UploadDigestMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def save_upload(file, file_path):
+    """
+    Store an uploaded file at file_path and describe it.
+
+    Uploads spooled to disk by Django are moved into place rather than copied.
+    When the digest was not gathered by one of the handlers above, the file is
+    hashed while it is written.
+    """
+    sha256_hash = getattr(file, 'sha256_hash', None)
+    if sha256_hash is None:
+        sha256_hash, size, head = write_file_chunks(file.chunks(), file_path)
+    else:
+        size, head = file.upload_size, file.upload_head
+        if hasattr(file, 'temporary_file_path'):
+            file_move_safe(file.temporary_file_path(), file_path, allow_overwrite=True)
+        else:
+            with open(file_path, 'wb') as temp_file:
+                for chunk in file.chunks():
+                    temp_file.write(chunk)
+    return build_upload_info(file_path, file.name, sha256_hash, size, head)
@@ -13,7 +13,9 @@ urlpatterns = [
     path('api/view_projects/', MultipleProjectDetailsAPIView.as_view(), name='api-project-details'),
     path('api/project_documents/<int:project_id>/', ProjectDocumentsAPIView.as_view(), name='api-project-documents'),
     path('api/ocrtext/<int:document_id>/', OCRTextDetailAPIView.as_view(), name='ocr-text-documents'),
+    path('api/ocrtext/<int:document_id>/pages/', OCRPageTextListAPIView.as_view(), name='ocr-text-pages'),
     path('api/document-image-urls/<int:document_id>/', DocumentImageURLListView.as_view(), name='document_image_urls_list'),
+    path('api/document-page-image/<int:document_id>/<int:page_number>/', DocumentPageImageAPIView.as_view(), name='document_page_image'),
     path('api/remove-project', ProjectDeleteAPIView.as_view(), name='api-project-delete'),
     path('api/download_document/<int:document_id>/', DocumentDownloadAPIView.as_view(), name='api-download-document'),
     path('api/remove-s3-file/', RemoveS3FileAPIView.as_view(), name='remove_s3_file'),
@@ -22,5 +24,6 @@ urlpatterns = [
     path('api/all/potential/users/', MultiplePotentialDetailsAPIView.as_view(), name='all-potential-user-details'),
     path('api/companies/create/', CompanyCreateAPIView.as_view(), name='company-create'),
     path('api/search-ocrtext/', OCRTextSearchAPIView.as_view(), name='search-ocrtext'),
+    path('api/email-lookup/', EmailDocumentLookupAPIView.as_view(), name='email-lookup'),
 
 ]
@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+# Backs user_id allocation. A sequence is used rather than a counter row
+# because nextval() takes no row lock and is not rolled back, so a number is
+# never handed out twice even when the signup transaction aborts.
+USER_ID_SEQUENCE = 'users_user_id_seq'
+
+_lock = threading.Lock()
+_block = deque()
+
+# A forked child must not hand out numbers reserved by its parent
+os.register_at_fork(after_in_child=_block.clear)
+
+
+def create_sequence(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate handler (see users/apps.py). Creating the sequence is
+    transactional, so it is done here rather than on first use, where a
+    rolled-back transaction would take it away again.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {USER_ID_SEQUENCE}")
+
+def encode_user_id(number):
+    """
+    USER_ID_PREFIX followed by number in USER_ID_ALPHABET, left padded to
+    USER_ID_MIN_LENGTH. The prefix keeps these apart from legacy ids (two
+    digits and a letter).
+    """
+    alphabet = settings.USER_ID_ALPHABET
+    digits = ''
+    while number:
+        number, remainder = divmod(number, len(alphabet))
+        digits = alphabet[remainder] + digits
+    user_id = settings.USER_ID_PREFIX + digits.rjust(settings.USER_ID_MIN_LENGTH, alphabet[0])
+    if len(user_id) > 20:
+        raise ValueError(f"user_id {user_id} does not fit User.user_id")
+    return user_id
+
+def decode_user_id(user_id):
+    """
+    The number encoded in a user_id, or None for ids in another format.
+    """
+    alphabet = settings.USER_ID_ALPHABET
+    prefix = settings.USER_ID_PREFIX
+    digits = user_id[len(prefix):]
+    if not user_id.startswith(prefix) or len(digits) < settings.USER_ID_MIN_LENGTH \
+            or any(digit not in alphabet for digit in digits):
+        return None
+    number = 0
+    for digit in digits:
+        number = number * len(alphabet) + alphabet.index(digit)
+    return number
+
+def _reserve(count):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT nextval('{USER_ID_SEQUENCE}') FROM generate_series(1, %s)", [count])
+        return [row[0] for row in cursor.fetchall()]
+
+def allocate_user_ids(count):
+    """
+    Return count new user ids. Numbers are reserved from the sequence in
+    blocks of USER_ID_BLOCK_SIZE, so most calls do not touch the database.
+    Numbers left in a block when the process exits are skipped.
+    """
+    with _lock:
+        if len(_block) < count:
+            _block.extend(_reserve(max(settings.USER_ID_BLOCK_SIZE, count - len(_block))))
+        return [encode_user_id(_block.popleft()) for _ in range(count)]
+
+def allocate_user_id():
+    return allocate_user_ids(1)[0]
+
+def advance_sequence(number):
+    """
+    Make sure the sequence continues after number, e.g. after restoring users
+    allocated against another database.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval('{USER_ID_SEQUENCE}', GREATEST(%s, (SELECT last_value FROM {USER_ID_SEQUENCE})))",
+            [number]
+        )
+    with _lock:
+        _block.clear()
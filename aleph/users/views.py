@@ -1,7 +1,11 @@
 from django.utils import timezone
+import json
 import time
+import traceback
 
 from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.urls import reverse
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -13,7 +17,12 @@ from helpers.s3 import *
 from helpers.checksum import *
 from helpers.ocr import *
 from users.serializers import *
-from users.tasks import process_document
+from users.tasks import process_document, render_page_on_demand
+from users.uploadhandlers import save_upload
+from users.pagination import paginate_if_requested
+from users.response_cache import cached_response
+from users.streaming import stream_ocr_text
+from users.search_backends import SEARCH_BACKENDS, get_search_backend
 from users.documents import *
 
 class LoginAPIView(generics.GenericAPIView):
@@ -45,7 +54,12 @@ class SingleUserDetailsAPIView(APIView):
 
 class MultipleUserDetailsAPIView(APIView):
     def get(self, request):
-        users = User.objects.all()
+        users = User.objects.prefetch_related('groups', 'user_permissions').order_by('id')
+        paginated = paginate_if_requested(self, request, users, UserViewSerializer)
+        if paginated is not None:
+            return paginated
+
+        users = list(users)
         if not users:
             return Response({"error": "No users found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -109,51 +123,94 @@ class PageDocumentUploadAPIView(APIView):
                 file_name = file.name
                 temp_file_path = f"/tmp/{file_name}"
 
-                with open(temp_file_path, 'wb+') as temp_file:
-                    for chunk in file.chunks():
-                        temp_file.write(chunk)
-
-                file_hash = calculate_checksum(temp_file_path, file_name)
-                unique_key = f"{file_hash}_{int(time.time())}"
+                # Hash, size, MIME type and page count are gathered while the
+                # upload is written, the file is not read again here
+                upload_info = save_upload(file, temp_file_path)
+                unique_key = f"{upload_info['checksum']}_{int(time.time())}"
                 if os.getenv('ENV') == 'PRODUCTION':
-                    task = process_document.delay(project_id, file_name, temp_file_path, bucket_name, unique_key)
+                    task = process_document.delay(project_id, file_name, temp_file_path, bucket_name, unique_key, upload_info)
                     tasks.append(task.id)
                 else:
-                    tasks = process_document(project_id, file_name, temp_file_path, bucket_name, unique_key)
+                    tasks = process_document(project_id, file_name, temp_file_path, bucket_name, unique_key, upload_info)
 
 
             return Response({'tasks': tasks}, status=status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class OCRTextSearchAPIView(APIView):
+    max_page_size = 100
+
     def get(self, request, *args, **kwargs):
         query = request.GET.get('q')
         if not query:
             return Response({"error": "No query provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        search_results = OCRTextDocument.search().query("multi_match", query=query, fields=['text'])
-        serialized_results = []
-        # search_results = OCRTextDocument.search().query("multi_match", query=query, fields=['text'])
-        # search_results = OCRTextDocument.search().query("term", text=query)
-
-        for result in search_results:
-            try:
-                if hasattr(result, 'to_dict'):  # Check if the result has a to_dict method (Elasticsearch result)
-                    data_dict = result.to_dict()
-                    serialized_data = OCRTextSerializer(data_dict).data
-                else:  # Assume it's already a model instance
-                    serialized_data = OCRTextSerializer(result).data
-
-                serialized_results.append(serialized_data)
-            except Exception as e:
-                # Handle any exceptions or log errors as needed
-                print(f"Error processing result: {e}")
+        backend_name = request.GET.get('backend')
+        if backend_name and backend_name not in SEARCH_BACKENDS:
+            return Response({"error": f"Unknown search backend: {backend_name}"}, status=status.HTTP_400_BAD_REQUEST)
+        backend = get_search_backend(backend_name)
+        unavailable_reason = backend.unavailable_reason()
+        if unavailable_reason:
+            return Response({"error": f"Search backend not available: {unavailable_reason}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            size = min(int(request.GET.get('size', 10)), self.max_page_size)
+            offset = int(request.GET.get('from', 0))
+            search_after = json.loads(request.GET['search_after']) if request.GET.get('search_after') else None
+            project_id = int(request.GET['project_id']) if request.GET.get('project_id') else None
+        except ValueError:
+            return Response({"error": "size, from and project_id must be integers, search_after a JSON list"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # search_after is the [score, document_id] of the previous page's last hit
+        if search_after is not None and not (
+                isinstance(search_after, list) and len(search_after) == 2
+                and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in search_after)):
+            return Response({"error": "search_after must be a list of two numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if size < 1 or offset < 0:
+            return Response({"error": "size must be positive and from not negative"}, status=status.HTTP_400_BAD_REQUEST)
+        if search_after is None and backend.max_window and offset + size > backend.max_window:
+            return Response({"error": f"Use search_after to page beyond {backend.max_window} results"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Results never contain the full text, only bounded highlight fragments
+        found = backend.search(
+            query, size, offset=offset, search_after=search_after,
+            project_id=project_id, file_type=request.GET.get('file_type')
+        )
+        return Response({
+            'total': found['total'],
+            'from': offset if search_after is None else None,
+            'size': size,
+            'next_search_after': found['next_search_after'],
+            'results': OCRTextSerializer(found['results'], many=True).data,
+        }, status=status.HTTP_200_OK)
+
+class EmailDocumentLookupAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        return Response(serialized_results, status=status.HTTP_200_OK)
+    def post(self, request, *args, **kwargs):
+        serializer = EmailLookupSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        addresses = {DocumentEmail.normalize(email) for email in serializer.validated_data['emails']}
+        matches = {address: [] for address in sorted(addresses)}
+        # All addresses are resolved in a single indexed query
+        rows = (DocumentEmail.objects.filter(email__in=addresses)
+                .order_by('email', 'document_id')
+                .values('email', 'document_id', 'document__file_name', 'document__file_url', 'document__project_id'))
+        for row in rows:
+            matches[row['email']].append({
+                'document_id': row['document_id'],
+                'file_name': row['document__file_name'],
+                'file_url': row['document__file_url'],
+                'project_id': row['document__project_id'],
+            })
+        return Response(matches, status=status.HTTP_200_OK)
 
 class DocumentImageURLListView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_response('document', 'document_id')
     def get(self, request, *args, **kwargs):
         # document_id = request.query_params.get('document_id')
         document_id = kwargs.get('document_id')
@@ -162,11 +219,51 @@ class DocumentImageURLListView(APIView):
             page_images = PageImage.objects.filter(document__id=document_id)
             # Serialize the queryset into JSON
             serializer = PageImageSerializer(page_images, many=True)
+            data = list(serializer.data)
+
+            # Pages not rendered yet (lazy rendering) are listed with the URL
+            # that renders them on first request
+            page_count = Document.objects.filter(id=document_id).values_list('page_count', flat=True).first()
+            rendered = {image['page_number'] for image in data}
+            for page_number in range(1, (page_count or 0) + 1):
+                if page_number not in rendered:
+                    data.append({
+                        'id': None,
+                        'document': document_id,
+                        'page_number': page_number,
+                        'image_url': None,
+                        'render_url': request.build_absolute_uri(
+                            reverse('document_page_image', kwargs={'document_id': document_id, 'page_number': page_number})
+                        ),
+                    })
+            data.sort(key=lambda image: image['page_number'] or 0)
             # Return the serialized data as JSON response
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(data, status=status.HTTP_200_OK)
         except PageImage.DoesNotExist:
             return Response({'error': 'OCR Text not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class DocumentPageImageAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, document_id, page_number):
+        try:
+            document = Document.objects.get(id=document_id)
+        except Document.DoesNotExist:
+            return Response({'error': 'Document does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        if page_number < 1 or (document.page_count is not None and page_number > document.page_count):
+            return Response({'error': 'Page does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            # Rendered on first request, later requests get the stored image
+            page_image = render_page_on_demand(document, page_number, os.getenv('ALEPH_BUCKET', 'aleph-s3-bucket'))
+        except Exception as e:
+            # S3 and PyMuPDF errors name buckets, keys and local paths, so they stay in the log
+            print(f"Rendering page {page_number} of document {document_id} failed: {e}")
+            traceback.print_exc()
+            return Response({'error': 'Page image could not be rendered'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(PageImageSerializer(page_image).data, status=status.HTTP_200_OK)
+
 class RemoveS3FileAPIView(APIView):
     permission_classes = [IsAuthenticated]
     def delete(self, request, *args, **kwargs):
@@ -178,13 +275,9 @@ class RemoveS3FileAPIView(APIView):
             return Response({'error': 'document_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Initialize the S3 client
+            # Shared S3 service of this process
             bucket_name = os.getenv('ALEPH_BUCKET')
-            s3_client = S3Service(
-                region_name=os.getenv('REGION'),
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-            )
+            s3_client = get_s3_service()
 
             # Find the document in the database using the document ID
             document = Document.objects.get(id=document_id)
@@ -212,11 +305,7 @@ class ProjectDeleteAPIView(APIView):
     def delete(self, request, *args, **kwargs):
         try:
             bucket_name = os.getenv('ALEPH_BUCKET')
-            s3_client = S3Service(
-                region_name=os.getenv('REGION'),
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-            )
+            s3_client = get_s3_service()
             project_id = request.data.get('project_id')
             project = Project.objects.get(id=project_id)
 
@@ -263,7 +352,13 @@ class MultipleProjectDetailsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request,):
-        projects = Project.objects.all()
+        # Count documents in the same query instead of once per project
+        projects = Project.objects.annotate(document_count=Count('documents')).order_by('id')
+        paginated = paginate_if_requested(self, request, projects, ProjectMultipleSerializer)
+        if paginated is not None:
+            return paginated
+
+        projects = list(projects)
         if not projects:
             return Response({"error": "No projects found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -273,6 +368,8 @@ class MultipleProjectDetailsAPIView(APIView):
 
 class DocumentDownloadAPIView(APIView):
     permission_classes = [IsAuthenticated]
+
+    @cached_response('document', 'document_id')
     def get(self, request, document_id):
         try:
             document = Document.objects.get(id=document_id)
@@ -285,6 +382,7 @@ class DocumentDownloadAPIView(APIView):
 class ProjectDocumentsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_response('project', 'project_id')
     def get(self, request, project_id):
         try:
             project = Project.objects.get(id=project_id)
@@ -292,7 +390,12 @@ class ProjectDocumentsAPIView(APIView):
             return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
         # Retrieve all documents associated with the project
-        documents = Document.objects.filter(project=project)
+        documents = Document.objects.filter(project=project).select_related('documentmeta').order_by('id')
+        paginated = paginate_if_requested(self, request, documents, PageDocumentSerializer)
+        if paginated is not None:
+            return paginated
+
+        documents = list(documents)
         if documents:
             # Serialize the documents
             serializer = PageDocumentSerializer(documents, many=True)
@@ -303,15 +406,60 @@ class ProjectDocumentsAPIView(APIView):
 class OCRTextDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cached_response('document', 'document_id')
     def get(self, request, *args, **kwargs):
         document_id = kwargs.get('document_id')
         try:
+            # ?stream=1 sends the text as chunked text/plain without loading it whole
+            if request.query_params.get('stream') in ('1', 'true'):
+                return stream_ocr_text(request, document_id)
             ocr_text = OCRText.objects.get(document__id=document_id)
             serializer = OCRTextSerializer(ocr_text)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except OCRText.DoesNotExist:
             return Response({'error': 'OCR Text not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class OCRPageTextListAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_pages = 50
+
+    def get(self, request, document_id):
+        try:
+            start = max(1, int(request.query_params.get('start', 1)))
+            end = int(request.query_params.get('end', start + 9))
+        except ValueError:
+            return Response({'error': 'start and end must be page numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        # Only a bounded range of pages is loaded per request
+        end = min(end, start + self.max_pages - 1)
+        if end < start:
+            return Response({'error': 'end must not be before start'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_count = OCRPageText.objects.filter(document_id=document_id).count()
+        if page_count:
+            pages = OCRPageText.objects.filter(document_id=document_id, page_number__gte=start, page_number__lte=end)
+        else:
+            # Documents ingested before page texts were stored only have the
+            # full text, which is served as their single page
+            ocr_text = OCRText.objects.filter(document_id=document_id).only('text').first()
+            if ocr_text is None:
+                return Response({'error': 'OCR Text not found'}, status=status.HTTP_404_NOT_FOUND)
+            page_count = 1
+            pages = [OCRPageText(document_id=document_id, page_number=1, text=ocr_text.text)] if start == 1 else []
+
+        next_url = None
+        if end < page_count:
+            next_url = request.build_absolute_uri(
+                f"{request.path}?start={end + 1}&end={min(page_count, 2 * end - start + 1)}"
+            )
+        return Response({
+            'document': document_id,
+            'page_count': page_count,
+            'start': start,
+            'end': min(end, page_count),
+            'pages': OCRPageTextSerializer(pages, many=True).data,
+            'next': next_url,
+        }, status=status.HTTP_200_OK)
+
 class PotentialUserCreateAPIView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = PotentialUserSerializer(data=request.data)
@@ -0,0 +1,7 @@
+import importlib.util
+
+# The Django suites need pytest-django and a Postgres database, both provided
+# in CI (.github/workflows/test.yml). Without the plugin only the plain tests
+# are collected.
+if importlib.util.find_spec('pytest_django') is None:
+    collect_ignore = ['aleph/users/tests.py']